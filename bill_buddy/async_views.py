@@ -0,0 +1,269 @@
+"""
+Coroutine versions of the public auth views, for ASGI deployments.
+
+They are routed instead of their counterparts in ``views`` when
+``AUTH_ASYNC_VIEWS`` is set, and share their checks and responses through
+``auth_flows``. Lookups use the async ORM, password hashing runs off the
+event loop (see ``hashers``) and emails are queued with ``aenqueue_email``;
+only multi-statement writes that need a transaction, such as registration,
+go through a single ``sync_to_async`` call.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.db import IntegrityError
+from rest_framework.views import APIView
+
+from . import auth_flows as flows
+from .authentication import ClaimsRefreshToken
+from .models import CustomUser, EmailVerificationToken, PasswordResetToken, hash_token
+from .profiles import aprofile_for
+from .serializers import PasswordResetConfirmSerializer, RegisterSerializer
+from .throttling import AUTH_THROTTLE_CLASSES
+from .tokens import EMAIL_VERIFY, PASSWORD_RESET, InvalidToken, aconsume_nonce, read_signed_token, uses_signed_tokens
+from .usernames import aget_or_create_by_email
+from .utils import asend_once, asend_password_reset_email, asend_verification_email
+
+
+class AsyncAPIView(APIView):
+    """
+    An ``APIView`` whose handlers are coroutines.
+
+    DRF's ``dispatch`` is synchronous, so this one mirrors it and awaits the
+    handler; Django then serves the view without a thread hop under ASGI.
+    The views are public, so no authenticators run and ``initial()`` stays
+    in memory. Throttles, whose counters may live in a shared cache, are
+    checked after it and awaited.
+    """
+    authentication_classes = ()
+
+    def check_throttles(self, request):
+        # Called by initial(); dispatch awaits acheck_throttles instead.
+        pass
+
+    async def acheck_throttles(self, request):
+        durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                durations.append(throttle.wait())
+        if durations:
+            self.throttled(request, max((d for d in durations if d is not None), default=None))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            await self.acheck_throttles(request)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class RegisterView(AsyncAPIView):
+    async def post(self, request):
+        serializer = RegisterSerializer(data=request.data)
+        if not await sync_to_async(serializer.is_valid)():
+            return flows.validation_failed(serializer.errors)
+
+        # The user is created through the manager, as the sync view does.
+        await sync_to_async(flows.register)(serializer, request)
+        return flows.registered()
+
+
+class EmailVerifyView(AsyncAPIView):
+    async def get(self, request):
+        token = request.query_params.get('token')
+        if uses_signed_tokens():
+            return await self.verify_signed_token(token)
+
+        try:
+            verification_token = await (
+                EmailVerificationToken.objects.select_related('user').aget(token_hash=hash_token(token))
+            )
+        except EmailVerificationToken.DoesNotExist:
+            return flows.invalid_verification_token()
+
+        error = flows.check_verification_token(verification_token, token)
+        if error is not None:
+            return error
+
+        user = verification_token.user
+        user.is_active = True
+        await user.asave()
+
+        verification_token.used = True
+        await verification_token.asave()
+
+        return flows.verified()
+
+    async def verify_signed_token(self, token):
+        try:
+            user_id, _, nonce = read_signed_token(token, EMAIL_VERIFY)
+            await aconsume_nonce(EMAIL_VERIFY, nonce)
+        except InvalidToken as exc:
+            return flows.signed_verification_error(exc)
+
+        if await CustomUser.objects.filter(pk=user_id, is_active=False).aupdate(is_active=True):
+            return flows.verified()
+
+        if await CustomUser.objects.filter(pk=user_id).aexists():
+            return flows.already_activated()
+        return flows.invalid_verification_token()
+
+
+class LoginView(AsyncAPIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        email = request.data.get('email')
+        password = request.data.get('password')
+        error = flows.missing_credentials(email, password)
+        if error is not None:
+            return error
+
+        user = await aauthenticate(request, email=email, password=password)
+        error = flows.login_refused(user)
+        if error is not None:
+            return error
+
+        refresh = await ClaimsRefreshToken.afor_user(user)
+        return flows.logged_in(refresh, (await aprofile_for(user))[0])
+
+
+class GoogleLoginView(AsyncAPIView):
+    async def post(self, request):
+        email = request.data.get("email")
+        if not email:
+            return flows.email_required("Email is required.")
+
+        try:
+            user, created = await aget_or_create_by_email(
+                email,
+                first_name="",
+                last_name="",
+                is_active=True,  # auto-activate Google users
+            )
+        except IntegrityError:
+            return flows.social_login_failed()
+
+        refresh = await ClaimsRefreshToken.afor_user(user)
+        return flows.logged_in(refresh, (await aprofile_for(user))[0], flows.social_login_message(created))
+
+
+class PasswordResetRequestView(AsyncAPIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'password_reset'
+
+    async def post(self, request):
+        email = request.data.get('email')
+        if not email:
+            return flows.email_required()
+        try:
+            user = await CustomUser.objects.by_email(email).aget()
+        except CustomUser.DoesNotExist:
+            return flows.user_not_found()
+
+        await asend_once(asend_password_reset_email, user, request, PASSWORD_RESET)
+        return flows.reset_requested()
+
+
+class PasswordResetConfirmView(AsyncAPIView):
+    async def post(self, request):
+        serializer = PasswordResetConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token = serializer.validated_data['token']
+        new_password = serializer.validated_data['new_password']
+
+        if uses_signed_tokens():
+            return await self.reset_with_signed_token(token, new_password)
+
+        try:
+            reset_token = await PasswordResetToken.objects.select_related('user').aget(token_hash=hash_token(token))
+        except PasswordResetToken.DoesNotExist:
+            return flows.invalid_reset_token()
+
+        error = flows.check_reset_token(reset_token)
+        if error is not None:
+            return error
+
+        user = reset_token.user
+        await user.aset_password(new_password)
+        await user.asave()
+
+        reset_token.used = True
+        await reset_token.asave()
+
+        return flows.password_reset()
+
+    async def reset_with_signed_token(self, token, new_password):
+        try:
+            user_id, version, nonce = read_signed_token(token, PASSWORD_RESET)
+            user = await CustomUser.objects.aget(pk=user_id)
+            flows.check_token_version(user, version)
+            await aconsume_nonce(PASSWORD_RESET, nonce)
+        except CustomUser.DoesNotExist:
+            return flows.invalid_reset_token()
+        except InvalidToken as exc:
+            return flows.signed_reset_error(exc)
+
+        await user.aset_password(new_password)
+        await user.asave(update_fields=['password'])
+
+        return flows.password_reset()
+
+
+class ResendVerificationEmailView(AsyncAPIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'resend_verification'
+
+    async def post(self, request):
+        email = request.data.get('email')
+        if not email:
+            return flows.email_required()
+
+        try:
+            user = await CustomUser.objects.by_email(email).aget()
+        except CustomUser.DoesNotExist:
+            return flows.user_not_found()
+
+        if user.is_active:
+            return flows.already_verified()
+
+        await asend_once(asend_verification_email, user, request, EMAIL_VERIFY)
+        return flows.verification_resent()
+
+
+class ResendPasswordResetEmailView(AsyncAPIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'resend_password_reset'
+
+    async def post(self, request):
+        email = request.data.get('email')
+        if not email:
+            return flows.email_required()
+
+        try:
+            user = await CustomUser.objects.by_email(email).aget()
+        except CustomUser.DoesNotExist:
+            return flows.user_not_found()
+
+        await asend_once(asend_password_reset_email, user, request, PASSWORD_RESET)
+        return flows.reset_resent()
@@ -0,0 +1,236 @@
+"""
+Request checks and responses shared by the auth views in ``views`` and their
+coroutine counterparts in ``async_views``.
+
+The two modules differ only in how they reach the database (and the mail
+outbox); everything that decides what a request gets back lives here, so a
+change to a flow is made once.
+"""
+from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
+from django.db import transaction
+from rest_framework import status
+
+from .response import custom_response
+from .tokens import TOKEN_MAX_AGE, InvalidToken, TokenAlreadyUsed, TokenExpired
+from .utils import send_verification_email
+
+LINK_EXPIRY = "the link will expire in 10 minutes."
+
+
+def validation_failed(errors):
+    return custom_response(
+        success=False,
+        message="Validation failed",
+        errors=errors,
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def email_required(message="Email is required"):
+    return custom_response(success=False, message=message, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def user_not_found():
+    return custom_response(
+        success=False,
+        message="User with this email does not exist",
+        status_code=status.HTTP_404_NOT_FOUND
+    )
+
+
+# Registration
+
+def register(serializer, request):
+    """Creates the user from a validated ``RegisterSerializer`` and queues the verification email."""
+    with transaction.atomic():
+        user = serializer.save()
+        send_verification_email(user, request)
+    return user
+
+
+def registered():
+    return custom_response(
+        success=True,
+        message=f"User registered successfully, Please check your email to verify your account {LINK_EXPIRY}",
+        status_code=status.HTTP_201_CREATED
+    )
+
+
+# Email verification
+
+def check_verification_token(verification_token, token):
+    """
+    The response for a stored verification token that can't activate its
+    user (a success if the user already is active), or None.
+    """
+    if verification_token.used:
+        return custom_response(success=False, message="Token already used.")
+
+    if verification_token.is_expired():
+        return custom_response(success=False, message="Token expired.")
+
+    try:
+        email = TimestampSigner().unsign(token, max_age=TOKEN_MAX_AGE)
+    except (SignatureExpired, BadSignature):
+        return custom_response(
+            success=False,
+            message="Invalid or expired token.",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = verification_token.user
+    if user.email != email:
+        return custom_response(success=False, message="Token does not match user.")
+
+    if user.is_active:
+        return already_activated()
+    return None
+
+
+def signed_verification_error(exc):
+    """The response for an ``InvalidToken`` raised reading a signed verification token."""
+    if isinstance(exc, TokenExpired):
+        return custom_response(success=False, message="Token expired.")
+    if isinstance(exc, TokenAlreadyUsed):
+        return custom_response(success=False, message="Token already used.")
+    return invalid_verification_token()
+
+
+def invalid_verification_token():
+    return custom_response(
+        success=False,
+        message="Invalid token.",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def verified():
+    return custom_response(success=True, message="Email verified successfully. You can now log in.")
+
+
+def already_activated():
+    return custom_response(success=True, message="Account already activated.")
+
+
+# Login
+
+def missing_credentials(email, password):
+    if not email or not password:
+        return custom_response(
+            success=False,
+            message="Email and password required",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
+
+def login_refused(user):
+    """The error response for an ``authenticate`` result that can't log in, or None."""
+    if user is None:
+        return custom_response(
+            success=False,
+            message="Invalid credentials",
+            status_code=status.HTTP_401_UNAUTHORIZED
+        )
+
+    if not user.is_active:
+        return custom_response(
+            success=False,
+            message="Account not activated. Please verify your email.",
+            status_code=status.HTTP_401_UNAUTHORIZED
+        )
+    return None
+
+
+def logged_in(refresh, profile, message="Login successful"):
+    """The token pair and the user's cached profile data."""
+    return custom_response(
+        success=True,
+        message=message,
+        data={
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "user": profile,
+        }
+    )
+
+
+def social_login_message(created):
+    return "Google account created and logged in." if created else "Google login successful."
+
+
+def social_login_failed():
+    return custom_response(
+        success=False,
+        message="Database error while creating or retrieving user.",
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+    )
+
+
+# Password reset
+
+def check_reset_token(reset_token):
+    """The error response for a stored reset token that can't be used, or None."""
+    if reset_token.used:
+        return custom_response(success=False, message="Token already used", status_code=400)
+
+    if reset_token.is_expired():
+        return custom_response(success=False, message="Token expired", status_code=400)
+    return None
+
+
+def check_token_version(user, version):
+    """
+    Rejects a signed token issued before the user's password changed (e.g.
+    through another reset link) or the account was deactivated.
+    """
+    if user.token_version != version:
+        raise InvalidToken
+
+
+def signed_reset_error(exc):
+    """The response for an ``InvalidToken`` raised reading a signed reset token."""
+    if isinstance(exc, TokenExpired):
+        return custom_response(success=False, message="Token expired", status_code=400)
+    if isinstance(exc, TokenAlreadyUsed):
+        return custom_response(success=False, message="Token already used", status_code=400)
+    return invalid_reset_token()
+
+
+def invalid_reset_token():
+    return custom_response(success=False, message="Invalid token", status_code=400)
+
+
+def password_reset():
+    return custom_response(success=True, message="Password reset successful")
+
+
+def reset_requested():
+    return custom_response(
+        success=True,
+        message=f"Password reset request sent. Please check your email {LINK_EXPIRY}"
+    )
+
+
+# Resends
+
+def already_verified():
+    return custom_response(
+        success=False,
+        message="Account is already verified.",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def verification_resent():
+    return custom_response(
+        success=True,
+        message=f"Verification email resent. Please check your inbox {LINK_EXPIRY}"
+    )
+
+
+def reset_resent():
+    return custom_response(
+        success=True,
+        message=f"Password reset email resent. Please check your inbox {LINK_EXPIRY}"
+    )
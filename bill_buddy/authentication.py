@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, BlacklistMixin, RefreshToken, TokenError
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .blacklist import get_blacklist_cache
+from .keyring import get_token_backend
+
+User = get_user_model()
+
+VERSION_CLAIM = 'ver'
+
+# Cached for users that don't exist or are inactive, so it never matches a claim.
+REVOKED = -1
+
+
+class KeyRingTokenMixin:
+    """Signs and verifies through the ``JWT_PRIVATE_KEYS`` key ring, if configured."""
+
+    @property
+    def token_backend(self):
+        return get_token_backend()
+
+
+class ClaimsAccessToken(KeyRingTokenMixin, AccessToken):
+    pass
+
+
+class ClaimsRefreshToken(KeyRingTokenMixin, RefreshToken):
+    """
+    A refresh token (and access tokens derived from it) carrying the claims
+    ``ClaimsUser`` is built from, so authenticated requests need no user query.
+    Blacklist checks go through ``bill_buddy.blacklist``'s cache.
+    """
+    access_token_class = ClaimsAccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        token = cls._with_claims(user)
+        OutstandingToken.objects.create(**token._outstanding_fields(user))
+        return token
+
+    @classmethod
+    async def afor_user(cls, user):
+        token = cls._with_claims(user)
+        await OutstandingToken.objects.acreate(**token._outstanding_fields(user))
+        return token
+
+    @classmethod
+    def _with_claims(cls, user):
+        # Token.for_user, without BlacklistMixin's OutstandingToken insert.
+        token = super(BlacklistMixin, cls).for_user(user)
+        token['username'] = user.username
+        token['email'] = user.email
+        token['is_active'] = user.is_active
+        token['is_staff'] = user.is_staff
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+    def _outstanding_fields(self, user):
+        return {
+            'user': user,
+            'jti': self[api_settings.JTI_CLAIM],
+            'token': str(self),
+            'created_at': self.current_time,
+            'expires_at': datetime_from_epoch(self['exp']),
+        }
+
+    def check_blacklist(self):
+        if get_blacklist_cache().is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        get_blacklist_cache().add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return blacklisted
+
+
+class ClaimsUser(TokenUser):
+    """
+    The user behind a validated access token, read from its claims.
+
+    ``instance`` loads the full ``CustomUser`` for views that need it.
+    """
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    @cached_property
+    def instance(self):
+        return User.objects.get(pk=self.id)
+
+
+def _version_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_VERSION_CACHE', 'default')]
+
+
+def _version_key(user_id):
+    return f'bill_buddy:token_version:{user_id}'
+
+
+def current_token_version(user_id):
+    """
+    Returns the user's ``token_version``, or ``REVOKED`` for a missing or
+    inactive user.
+
+    Versions are cached for ``AUTH_TOKEN_VERSION_CACHE_TIMEOUT`` seconds and
+    dropped from the cache whenever a user is saved or deleted.
+    """
+    cache = _version_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+        )
+        if version is None:
+            version = REVOKED
+        cache.set(key, version, getattr(settings, 'AUTH_TOKEN_VERSION_CACHE_TIMEOUT', 60))
+    return version
+
+
+def forget_token_version(user_id):
+    _version_cache().delete(_version_key(user_id))
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates a request from the access token alone.
+
+    The only lookup is the user's current token version, normally served by
+    the cache; tokens issued before a password change or deactivation carry
+    an older version and are rejected.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        version = validated_token.get(VERSION_CLAIM)
+        if version is None or version != current_token_version(validated_token[api_settings.USER_ID_CLAIM]):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return user
@@ -1,14 +1,38 @@
 from django.contrib.auth.backends import ModelBackend
 from .models import CustomUser
+from .hashers import arun_dummy_hash, averify_password, run_dummy_hash, verify_password
+
+# Everything the login path touches: the hash and active flag for
+# authentication, the id and claims for the JWT and the profile for the response.
+AUTH_FIELDS = ('id', 'password', 'is_active', 'is_staff', 'token_version', *CustomUser.PROFILE_FIELDS)
+
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         email = kwargs.get('email', username)
+        if email is None or password is None:
+            return None
         try:
-            user = CustomUser.objects.get(email=email)
+            user = CustomUser.objects.only(*AUTH_FIELDS).by_email(email).get()
         except CustomUser.DoesNotExist:
+            # Pay for a hash anyway so unknown emails can't be told apart by timing.
+            run_dummy_hash(password)
             return None
-        
-        if user.check_password(password) and self.user_can_authenticate(user):
+
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        email = kwargs.get('email', username)
+        if email is None or password is None:
+            return None
+        try:
+            user = await CustomUser.objects.only(*AUTH_FIELDS).by_email(email).aget()
+        except CustomUser.DoesNotExist:
+            await arun_dummy_hash(password)
+            return None
+
+        if await averify_password(user, password) and self.user_can_authenticate(user):
             return user
         return None
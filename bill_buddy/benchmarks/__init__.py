@@ -0,0 +1,115 @@
+"""
+Benchmarks for the auth service, run with ``manage.py benchmark``.
+
+Every module in this package registers its benchmarks with ``@benchmark``.
+A benchmark receives the command options and returns a dict of
+``metric name -> number``. Benchmarks that hit the database from several
+threads pass ``threaded=True`` so SQLite test databases are created on disk,
+where writers wait on each other instead of failing with "table is locked".
+The tables are flushed after every benchmark that uses the database, so
+each one seeds into an empty database.
+
+``--save-baseline`` stores a run's results and ``--baseline`` fails a later
+run whose results regress against them (see ``find_regressions``).
+"""
+import importlib
+import pkgutil
+import time
+
+from django.conf import settings
+from django.test.utils import override_settings
+
+BENCHMARKS = {}
+
+
+def benchmark(name, uses_db=False, threaded=False):
+    def decorator(func):
+        func.uses_db = uses_db
+        func.threaded = threaded
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def load_benchmarks():
+    for module in pkgutil.iter_modules(__path__):
+        importlib.import_module(f'{__name__}.{module.name}')
+    return BENCHMARKS
+
+
+def bulk_request_settings():
+    """
+    Settings for driving the auth endpoints in bulk from one client: MD5
+    password hashes, so hashing doesn't drown out the rest, and no throttling.
+    """
+    return override_settings(
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+    )
+
+
+def time_per_call(func, number=1000, repeat=5):
+    """Best-of-``repeat`` wall time per call of ``func``, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def time_each(func, args):
+    """Calls ``func(arg)`` for every arg and returns the per-call wall times."""
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def latency_summary(samples, prefix=''):
+    """Mean and p50/p95/p99 of ``samples`` (seconds), reported in microseconds."""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1e6
+
+    return {
+        f'{prefix}mean_us': sum(ordered) / len(ordered) * 1e6,
+        f'{prefix}p50_us': percentile(0.50),
+        f'{prefix}p95_us': percentile(0.95),
+        f'{prefix}p99_us': percentile(0.99),
+    }
+
+
+def find_regressions(baseline, results, tolerance):
+    """
+    Compares ``results`` with ``baseline`` (both ``benchmark.metric -> number``)
+    and describes each regression.
+
+    Query and failure counts may not grow at all. Throughput (``*_per_second``)
+    may drop and timings (``*_us``, ``*_seconds``) may grow by ``tolerance``,
+    a fraction of the baseline value. Tail percentiles (``*_p95_us``,
+    ``*_p99_us``) are too noisy over a few hundred samples to gate on, so
+    they and any other metrics are informational.
+    """
+    regressions = []
+    for metric, expected in sorted(baseline.items()):
+        actual = results.get(metric)
+        if actual is None:
+            continue
+        if 'queries' in metric or metric.endswith('_failures'):
+            regressed = actual > expected
+        elif metric.endswith('_per_second'):
+            regressed = actual < expected * (1 - tolerance)
+        elif metric.endswith(('_p95_us', '_p99_us')):
+            continue
+        elif metric.endswith(('_us', '_seconds')):
+            regressed = actual > expected * (1 + tolerance)
+        else:
+            continue
+        if regressed:
+            regressions.append(f"{metric}: {actual:.3f} (baseline {expected:.3f})")
+    return regressions
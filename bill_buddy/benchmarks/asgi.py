@@ -0,0 +1,120 @@
+import asyncio
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+
+from bill_buddy import urls
+from bill_buddy.benchmarks import benchmark, bulk_request_settings, latency_summary
+from bill_buddy.models import CustomUser
+
+CONCURRENCY = 16
+
+
+def _reload_urls():
+    # The root URLconf's include() resolvers cache their patterns, so it is
+    # rebuilt too.
+    importlib.reload(urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def _routing(async_views):
+    """Routes the auth endpoints to the sync or async views (``AUTH_ASYNC_VIEWS``)."""
+    try:
+        with override_settings(AUTH_ASYNC_VIEWS=async_views):
+            _reload_urls()
+            yield
+    finally:
+        _reload_urls()
+
+
+def _requests(count):
+    login = reverse('login')
+    unknown = reverse('password-reset')
+    verify = reverse('email-verify')
+    mix = [
+        ('post', login, {'email': 'load@example.com', 'password': 'secret123'}),
+        ('post', unknown, {'email': 'nobody@example.com'}),
+        ('get', verify, {'token': 'not-a-token'}),
+    ]
+    return [mix[i % len(mix)] for i in range(count)]
+
+
+def _wsgi(requests):
+    """Sync views behind the WSGI handler, one worker thread per connection."""
+    samples = []
+
+    def worker(share):
+        client = Client()
+        try:
+            for method, url, data in share:
+                start = time.perf_counter()
+                getattr(client, method)(url, data)
+                samples.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(requests[i::CONCURRENCY],)) for i in range(CONCURRENCY)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, samples
+
+
+def _asgi(requests):
+    """The same requests through the ASGI handler, ``CONCURRENCY`` in flight."""
+    samples = []
+
+    async def worker(share):
+        client = AsyncClient()
+        for method, url, data in share:
+            start = time.perf_counter()
+            await getattr(client, method)(url, data)
+            samples.append(time.perf_counter() - start)
+
+    async def run():
+        await asyncio.gather(*(worker(requests[i::CONCURRENCY]) for i in range(CONCURRENCY)))
+        await sync_to_async(connections.close_all)()
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start, samples
+
+
+@benchmark('asgi_throughput', uses_db=True, threaded=True)
+def asgi_throughput(options):
+    """
+    Throughput of a login / unknown-email reset / bad-token verify mix under
+    WSGI with the sync views, and under ASGI with the sync and async views.
+
+    Requests are driven in-process through Django's test clients, so this
+    compares the handler and view paths rather than a particular server.
+    Passwords use MD5 and throttling is off (``bulk_request_settings``).
+    """
+    with bulk_request_settings():
+        CustomUser.objects.create_user('load@example.com', 'secret123', username='load', is_active=True)
+        connections.close_all()
+        requests = _requests(min(options['number'], 600))
+
+        results = {'requests': len(requests), 'concurrency': CONCURRENCY}
+        for mode, run, async_views in (
+            ('wsgi_sync', _wsgi, False),
+            ('asgi_sync', _asgi, False),
+            ('asgi_async', _asgi, True),
+        ):
+            with _routing(async_views):
+                elapsed, samples = run(requests)
+            results[f'{mode}_requests_per_second'] = len(samples) / elapsed
+            results.update(latency_summary(samples, f'{mode}_'))
+    return results
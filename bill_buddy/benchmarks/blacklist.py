@@ -0,0 +1,53 @@
+import uuid
+from datetime import timedelta
+
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from bill_buddy.benchmarks import benchmark, latency_summary, time_each
+from bill_buddy.blacklist import BlacklistCache
+from bill_buddy.models import CustomUser
+
+
+def _seed(rows, batch_size=5000):
+    user = CustomUser.objects.create(email='bench@example.com', username='bench', password='!')
+    expires_at = timezone.now() + timedelta(days=1)
+    jtis = []
+    for start in range(0, rows, batch_size):
+        outstanding = OutstandingToken.objects.bulk_create(
+            OutstandingToken(user=user, jti=uuid.uuid4().hex, token='', expires_at=expires_at)
+            for _ in range(min(batch_size, rows - start))
+        )
+        BlacklistedToken.objects.bulk_create(BlacklistedToken(token=token) for token in outstanding)
+        jtis.extend(token.jti for token in outstanding)
+    return jtis, expires_at.timestamp()
+
+
+@benchmark('blacklist_check', uses_db=True)
+def blacklist_check(options):
+    """Refresh-token blacklist checks against ``--rows`` blacklisted tokens."""
+    rows = min(options['rows'], 200_000)
+    blacklisted, exp = _seed(rows)
+    lookups = min(options['number'], 2000)
+    unknown = [uuid.uuid4().hex for _ in range(lookups)]
+    known = blacklisted[:lookups]
+
+    def database(jti):
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    local_only = BlacklistCache()
+    with override_settings(JWT_BLACKLIST_CACHE='default'):
+        shared = BlacklistCache()
+    shared.is_blacklisted(unknown[0], exp)  # builds the Bloom filter
+    for jti in known:
+        local_only.is_blacklisted(jti, exp)
+
+    return {
+        'blacklisted_rows': rows,
+        **latency_summary(time_each(database, unknown), 'database_'),
+        **latency_summary(time_each(lambda jti: local_only.is_blacklisted(jti, exp), unknown), 'local_miss_'),
+        **latency_summary(time_each(lambda jti: local_only.is_blacklisted(jti, exp), known), 'local_hit_'),
+        **latency_summary(time_each(lambda jti: shared.is_blacklisted(jti, exp), unknown), 'bloom_miss_'),
+        'bloom_bytes': len(shared.bloom.bits),
+    }
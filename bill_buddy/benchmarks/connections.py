@@ -0,0 +1,65 @@
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+
+MODES = (
+    ('reconnect', 0, False),
+    ('persistent', 600, False),
+    ('persistent_health_checks', 600, True),
+)
+
+
+@benchmark('db_connections', uses_db=True, threaded=True)
+def db_connections(options):
+    """
+    Per-request cost of a one-query request (an unknown email-verify token)
+    reconnecting every request vs. keeping the connection, with and without
+    health checks.
+
+    Requests go through the WSGI handler with the request_started/finished
+    signals that open and close connections. The test database is a file
+    even on SQLite, so connections are really opened; on Postgres
+    (``DB_ENGINE``) connecting costs far more. With ``DB_POOL`` set the
+    ``configured`` figures show the pool.
+    """
+    number = min(options['number'], 2000)
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    url = f"{reverse('email-verify')}?token=unknown"
+    connection = connections['default']
+    settings_dict = connection.settings_dict
+    saved = settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS']
+
+    connects = []
+
+    def count_connect(sender, **kwargs):
+        connects.append(1)
+
+    def request():
+        request_started.send(sender=WSGIHandler)
+        try:
+            handler.get_response(factory.get(url))
+        finally:
+            request_finished.send(sender=WSGIHandler)
+
+    connection_created.connect(count_connect)
+    results = {}
+    try:
+        modes = [*MODES, ('configured', *saved)]
+        for mode, max_age, health_checks in modes:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = max_age, health_checks
+            connects.clear()
+            results[f'{mode}_request_us'] = time_per_call(request, number, repeat=1) * 1e6
+            results[f'{mode}_connects_per_request'] = len(connects) / number
+        results['saved_per_request_us'] = results['reconnect_request_us'] - results['persistent_request_us']
+    finally:
+        connection_created.disconnect(count_connect)
+        settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = saved
+        connection.close()
+    return results
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from django.test import RequestFactory
+from django.urls import reverse
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.emails import get_email_templates, request_origin
+from bill_buddy.utils import _render_token_email
+
+TOKEN = 'jane@example.com:1uAbCd:abcdefghijklmnopqrstuvwxyz0123456789ABCDEFG'
+
+
+def _fstring_email(user, request):
+    # The inline rendering send_verification_email used before the template cache.
+    verify_url = request.build_absolute_uri(
+        reverse('email-verify') + f'?token={TOKEN}'
+    )
+    subject = 'Verify Your Email - Bill Buddy'
+    message = f"""
+    Hi {user.first_name},
+
+    Please verify your email by clicking the link below:
+
+    {verify_url}
+
+    If you did not register, please ignore this email.
+
+    Thanks,
+    Bill Buddy Team
+    """
+    return subject, message
+
+
+@benchmark('email_render')
+def email_render(options):
+    request = RequestFactory().get('/api/register/')
+    user = SimpleNamespace(first_name='Jane')
+    number = options['number']
+    get_email_templates('verification')
+
+    def cached_templates():
+        _render_token_email('verification', user, 'email-verify', request_origin(request), TOKEN)
+
+    def uncached_templates():
+        get_email_templates.cache_clear()
+        _render_token_email('verification', user, 'email-verify', request_origin(request), TOKEN)
+
+    return {
+        'fstring_us_per_msg': time_per_call(lambda: _fstring_email(user, request), number) * 1e6,
+        'cached_text_html_us_per_msg': time_per_call(cached_templates, number) * 1e6,
+        'uncached_text_html_us_per_msg': time_per_call(uncached_templates, number // 10 or 1) * 1e6,
+    }
@@ -0,0 +1,253 @@
+import asyncio
+import http.client
+import itertools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.testcases import QuietWSGIRequestHandler
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from bill_buddy.authentication import ClaimsRefreshToken
+from bill_buddy.benchmarks import benchmark, bulk_request_settings, latency_summary
+from bill_buddy.benchmarks.asgi import CONCURRENCY, _routing
+from bill_buddy.metrics import registry
+from bill_buddy.models import CustomUser, EmailVerificationToken, PasswordResetToken
+from bill_buddy.tokens import EMAIL_VERIFY, PASSWORD_RESET
+from bill_buddy.utils import _issue_token
+
+PASSWORD = 'secret123'
+
+
+def _seed(rows, batch_size=5000, prefix='seed'):
+    """
+    ``rows`` users, every other one active (verified). Each active user has an
+    outstanding refresh token and a quarter of those tokens are blacklisted.
+    """
+    password = make_password(PASSWORD)
+    expires_at = timezone.now() + timedelta(days=1)
+    for start in range(0, rows, batch_size):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(
+                username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password=password,
+                first_name='Seed', last_name=str(i), gender='female', is_active=i % 2 == 0,
+            )
+            for i in range(start, min(rows, start + batch_size))
+        )
+        outstanding = OutstandingToken.objects.bulk_create(
+            OutstandingToken(user=user, jti=uuid.uuid4().hex, token='', expires_at=expires_at)
+            for user in users if user.is_active
+        )
+        BlacklistedToken.objects.bulk_create(BlacklistedToken(token=token) for token in outstanding[::4])
+
+
+class _SeededUsers:
+    """Hands out seeded users no earlier request has touched, in pk order."""
+
+    def __init__(self):
+        self.last_pk = {True: 0, False: 0}
+        self.new = itertools.count()
+
+    def take(self, count, active=True):
+        users = list(
+            CustomUser.objects.filter(is_active=active, username__startswith='seed', pk__gt=self.last_pk[active])
+            .order_by('pk')[:count]
+        )
+        if len(users) < count:
+            raise RuntimeError("Not enough seeded users; raise --rows or lower --number.")
+        self.last_pk[active] = users[-1].pk
+        return users
+
+    def new_email(self):
+        return f'new{next(self.new)}@example.com'
+
+
+def _post(url_name, data, headers=None):
+    return 'POST', reverse(url_name), json.dumps(data), headers or {}
+
+
+def _scenarios(users, count):
+    """
+    ``(name, url name, method, requests)`` for every route in
+    ``bill_buddy.urls``, each request as ``(method, path, body, headers)``.
+    The tokens, emails and users they need are set up here, untimed.
+    """
+    def tokens(model, purpose, active):
+        return [_issue_token(model, user, purpose) for user in users.take(count, active)]
+
+    def refresh_tokens():
+        return [ClaimsRefreshToken.for_user(user) for user in users.take(count)]
+
+    emails = [users.new_email() for _ in range(count)]
+    returning = [user.email for user in users.take(count // 2)]
+    return [
+        ('register', 'register', 'POST', [
+            _post('register', {
+                'email': email, 'username': email.split('@')[0], 'password': PASSWORD,
+                'first_name': 'New', 'last_name': 'User', 'gender': 'male',
+            })
+            for email in emails
+        ]),
+        ('login', 'login', 'POST', [
+            _post('login', {'email': user.email, 'password': PASSWORD}) for user in users.take(count)
+        ]),
+        ('email_verify', 'email-verify', 'GET', [
+            ('GET', f"{reverse('email-verify')}?{urlencode({'token': token})}", '', {})
+            for token in tokens(EmailVerificationToken, EMAIL_VERIFY, active=False)
+        ]),
+        ('password_reset', 'password-reset', 'POST', [
+            _post('password-reset', {'email': user.email}) for user in users.take(count)
+        ]),
+        ('password_reset_confirm', 'password-reset-confirm', 'POST', [
+            _post('password-reset-confirm', {'token': token, 'new_password': 'n3w-Secret!'})
+            for token in tokens(PasswordResetToken, PASSWORD_RESET, active=True)
+        ]),
+        ('resend_verification', 'resend-verification', 'POST', [
+            _post('resend-verification', {'email': user.email}) for user in users.take(count, active=False)
+        ]),
+        ('resend_password_reset', 'resend-password-reset', 'POST', [
+            _post('resend-password-reset', {'email': user.email}) for user in users.take(count)
+        ]),
+        ('logout', 'logout', 'POST', [
+            _post('logout', {'refresh': str(refresh)}, {'Authorization': f'Bearer {refresh.access_token}'})
+            for refresh in refresh_tokens()
+        ]),
+        ('social_login', 'social-login', 'POST', [
+            _post('social-login', {'email': email})
+            for email in itertools.chain(returning, (users.new_email() for _ in range(count - len(returning))))
+        ]),
+    ]
+
+
+def _test_client(requests):
+    """The Django test client, one request at a time."""
+    client = Client()
+    samples, failures = [], 0
+    start = time.perf_counter()
+    for method, path, body, headers in requests:
+        request_start = time.perf_counter()
+        response = client.generic(method, path, body, content_type='application/json', headers=headers)
+        samples.append(time.perf_counter() - request_start)
+        failures += response.status_code >= 400
+    return time.perf_counter() - start, samples, failures
+
+
+@contextmanager
+def _wsgi_server():
+    """Django's threaded development server on an ephemeral port, in a thread."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _wsgi(requests):
+    """Real HTTP against the in-process WSGI server, ``CONCURRENCY`` keep-alive clients."""
+    samples, failures = [], []
+
+    def worker(port, share):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        try:
+            for method, path, body, headers in share:
+                request_start = time.perf_counter()
+                connection.request(method, path, body or None, {'Content-Type': 'application/json', **headers})
+                response = connection.getresponse()
+                response.read()
+                samples.append(time.perf_counter() - request_start)
+                if response.status >= 400:
+                    failures.append(response.status)
+        finally:
+            connection.close()
+
+    with _wsgi_server() as port:
+        threads = [
+            threading.Thread(target=worker, args=(port, requests[i::CONCURRENCY])) for i in range(CONCURRENCY)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return elapsed, samples, len(failures)
+
+
+def _asgi(requests):
+    """The ASGI handler with the async views, ``CONCURRENCY`` requests in flight."""
+    samples, failures = [], []
+
+    async def worker(share):
+        client = AsyncClient()
+        for method, path, body, headers in share:
+            request_start = time.perf_counter()
+            response = await client.generic(method, path, body, content_type='application/json', headers=headers)
+            samples.append(time.perf_counter() - request_start)
+            if response.status_code >= 400:
+                failures.append(response.status_code)
+
+    async def run():
+        await asyncio.gather(*(worker(requests[i::CONCURRENCY]) for i in range(CONCURRENCY)))
+        await sync_to_async(connections.close_all)()
+
+    with _routing(async_views=True):
+        start = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    return elapsed, samples, len(failures)
+
+
+TRANSPORTS = (('client', _test_client), ('wsgi', _wsgi), ('asgi', _asgi))
+
+
+@benchmark('auth_endpoints', uses_db=True, threaded=True)
+def auth_endpoints(options):
+    """
+    Every auth route against ``--rows`` seeded users (with their refresh
+    tokens and blacklist entries), through the test client, a threaded WSGI
+    server over real sockets and the ASGI handler with the async views.
+
+    Reports throughput, latency percentiles, queries per request (from
+    ``bill_buddy.metrics``) and the number of 4xx/5xx responses, per
+    transport and route. Passwords use MD5 and throttling is off
+    (``bulk_request_settings``); the ``password_hashing`` and
+    ``throttling`` benchmarks cover those. The database is the
+    configured one, so ``DB_ENGINE=django.db.backends.postgresql`` (and the
+    ``DB_*`` settings) runs it on Postgres.
+    """
+    rows = max(options['rows'], 1000)
+    count = max(1, min(options['number'], 200, rows // 40))
+    with bulk_request_settings():
+        _seed(rows)
+        users = _SeededUsers()
+        results = {'rows': rows, 'requests_per_route': count}
+        for transport, run in TRANSPORTS:
+            for name, url_name, method, requests in _scenarios(users, count):
+                connections.close_all()
+                registry.reset()
+                elapsed, samples, failures = run(requests)
+                served, queries = registry.requests_and_queries(url_name, method)
+                prefix = f'{transport}_{name}_'
+                results[f'{prefix}requests_per_second'] = len(samples) / elapsed
+                results.update(latency_summary(samples, prefix))
+                results[f'{prefix}queries_per_request'] = queries / served if served else 0.0
+                results[f'{prefix}failures'] = failures
+        registry.reset()
+    return results
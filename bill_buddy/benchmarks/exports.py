@@ -0,0 +1,31 @@
+import time
+import tracemalloc
+
+from bill_buddy.benchmarks import benchmark
+from bill_buddy.benchmarks.endpoints import _seed
+from bill_buddy.exports import FORMATS, export_pages
+
+
+@benchmark('user_export', uses_db=True)
+def user_export(options):
+    """
+    Rows per second and peak Python memory streaming ``--rows`` seeded users
+    (with refresh tokens and blacklist entries) through the staff export,
+    per format, against the same rows loaded into one list.
+    """
+    rows = max(options['rows'], 1000)
+    _seed(rows, prefix='export')
+    results = {'rows': rows}
+
+    def measure(name, consume):
+        tracemalloc.start()
+        start = time.perf_counter()
+        consume()
+        results[f'{name}_rows_per_second'] = rows / (time.perf_counter() - start)
+        results[f'{name}_peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    for export_format, chunks in FORMATS.items():
+        measure(export_format, lambda: sum(len(chunk) for chunk in chunks(export_pages(2000))))
+    measure('unpaged', lambda: len(list(next(export_pages(rows + 1)))))
+    return results
@@ -0,0 +1,41 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.hashers import _hasher_path, _verify
+
+PASSWORD = 'correct horse battery staple'
+
+
+@benchmark('password_hashing')
+def password_hashing(options):
+    """
+    Logins/sec per core for each hasher tier, plus the aggregate rate through
+    a process pool with one worker per CPU.
+    """
+    number = max(1, options['number'] // 200)
+    workers = os.cpu_count() or 1
+    results = {}
+    for name, path in settings.PASSWORD_HASHER_TIERS.items():
+        hasher = import_string(path)()
+        try:
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+        except ValueError:
+            # argon2-cffi (or another optional library) is not installed.
+            continue
+
+        per_login = time_per_call(lambda: hasher.verify(PASSWORD, encoded), number, repeat=3)
+        results[f'{name}_ms_per_login'] = per_login * 1e3
+        results[f'{name}_logins_per_sec_per_core'] = 1 / per_login
+
+        logins = number * workers * 2
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_verify, [_hasher_path(hasher)] * workers, [PASSWORD] * workers, [encoded] * workers))
+            start = time.perf_counter()
+            list(pool.map(_verify, [_hasher_path(hasher)] * logins, [PASSWORD] * logins, [encoded] * logins))
+            results[f'{name}_pool_logins_per_sec_{workers}_workers'] = logins / (time.perf_counter() - start)
+    return results
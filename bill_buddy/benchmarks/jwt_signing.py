@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from jwt.algorithms import has_crypto
+from rest_framework_simplejwt.backends import TokenBackend
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.keyring import KeyRing, SigningKey
+
+
+def _pem(kind):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    key = rsa.generate_private_key(65537, 2048) if kind == 'RS256' else ed25519.Ed25519PrivateKey.generate()
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+
+
+@benchmark('jwt_signing')
+def jwt_signing(options):
+    """
+    Sign and verify cost per access token for HS256, RS256 (2048-bit) and
+    EdDSA (Ed25519). The asymmetric ones are skipped without cryptography.
+    """
+    now = int(time.time())
+    payload = {
+        'token_type': 'access', 'exp': now + 300, 'iat': now, 'jti': 'a' * 32, 'user_id': 42,
+        'username': 'jane', 'email': 'jane@example.com', 'is_active': True, 'is_staff': False, 'ver': 0,
+    }
+    backends = {'hs256': TokenBackend('HS256', settings.SECRET_KEY)}
+    if has_crypto:
+        for algorithm in ('RS256', 'EdDSA'):
+            backends[algorithm.lower()] = KeyRing([SigningKey(_pem(algorithm))]).backend
+
+    results = {}
+    number = min(options['number'], 500)
+    for name, backend in backends.items():
+        token = backend.encode(payload)
+        results[f'{name}_sign_us'] = time_per_call(lambda: backend.encode(payload), number) * 1e6
+        results[f'{name}_verify_us'] = time_per_call(lambda: backend.decode(token), number) * 1e6
+        results[f'{name}_token_bytes'] = len(token)
+    return results
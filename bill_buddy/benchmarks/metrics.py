@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.metrics import RequestMetrics, RequestMetricsMiddleware, _current, registry
+
+MIDDLEWARE_PATH = 'bill_buddy.metrics.RequestMetricsMiddleware'
+
+
+@benchmark('request_metrics', uses_db=True)
+def request_metrics(options):
+    """Per-request and per-query cost of ``RequestMetricsMiddleware``."""
+    number = options['number']
+    request = RequestFactory().get(reverse('jwks'))
+    request.resolver_match = resolve(request.path)
+
+    def view(request):
+        return HttpResponse()
+
+    middleware = RequestMetricsMiddleware(view)
+    with override_settings(REQUEST_METRICS_SERVER_TIMING=True):
+        timing_middleware = RequestMetricsMiddleware(view)
+    results = {
+        'bare_view_us': time_per_call(lambda: view(request), number) * 1e6,
+        'middleware_us': time_per_call(lambda: middleware(request), number) * 1e6,
+        'middleware_server_timing_us': time_per_call(lambda: timing_middleware(request), number) * 1e6,
+    }
+    results['overhead_us'] = results['middleware_us'] - results['bare_view_us']
+
+    with connection.cursor() as cursor:
+        def query():
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+        results['query_outside_request_us'] = time_per_call(query, number) * 1e6
+        token = _current.set(RequestMetrics())
+        try:
+            results['query_in_request_us'] = time_per_call(query, number) * 1e6
+        finally:
+            _current.reset(token)
+
+    # The full stack, serving the JWKS document, with and without the middleware.
+    requests = min(number, 500)
+    client = Client()
+    results['jwks_request_us'] = time_per_call(lambda: client.get('/api/.well-known/jwks.json'), requests) * 1e6
+    with override_settings(MIDDLEWARE=[path for path in settings.MIDDLEWARE if path != MIDDLEWARE_PATH]):
+        client = Client()
+        results['jwks_request_without_metrics_us'] = (
+            time_per_call(lambda: client.get('/api/.well-known/jwks.json'), requests) * 1e6
+        )
+    registry.reset()
+    return results
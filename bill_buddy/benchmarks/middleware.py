@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from bill_buddy.benchmarks import benchmark, bulk_request_settings, time_per_call
+from bill_buddy.models import CustomUser
+
+SCOPED_PATH = 'bill_buddy.middleware.BrowserMiddleware'
+
+
+def _full_stack():
+    """``MIDDLEWARE`` with ``BROWSER_MIDDLEWARE`` inlined, as it was before scoping."""
+    middleware = []
+    for path in settings.MIDDLEWARE:
+        middleware.extend(settings.BROWSER_MIDDLEWARE if path == SCOPED_PATH else [path])
+    return middleware
+
+
+def _async_time_per_call(make_request, number):
+    async def run():
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(number):
+                await make_request()
+            best = min(best, (time.perf_counter() - start) / number)
+        return best
+
+    return asyncio.run(run())
+
+
+@benchmark('middleware_stack', uses_db=True)
+def middleware_stack(options):
+    """
+    Per-request cost of API calls with the full browser middleware stack vs.
+    the lean one ``BrowserMiddleware`` leaves them, under the WSGI and ASGI
+    handlers (middleware, URL resolution and view; no server or client).
+    Requests carry session and CSRF cookies, as a browser client's would.
+    """
+    number = min(options['number'], 1000)
+    with bulk_request_settings():
+        CustomUser.objects.create_user('load@example.com', 'secret123', username='load', is_active=True)
+        jwks = reverse('jwks')
+        login = reverse('login')
+        credentials = {'email': 'load@example.com', 'password': 'wrong'}
+        cookies = 'sessionid=' + 'x' * 32 + '; csrftoken=' + 'y' * 32
+        factory = RequestFactory(HTTP_COOKIE=cookies)
+        async_factory = AsyncRequestFactory(HTTP_COOKIE=cookies)
+
+        results = {}
+        for stack, middleware in (('full', _full_stack()), ('lean', settings.MIDDLEWARE)):
+            with override_settings(MIDDLEWARE=middleware):
+                wsgi, asgi = WSGIHandler(), ASGIHandler()
+            results[f'{stack}_wsgi_jwks_us'] = time_per_call(lambda: wsgi.get_response(factory.get(jwks)), number) * 1e6
+            results[f'{stack}_wsgi_login_us'] = time_per_call(
+                lambda: wsgi.get_response(factory.post(login, credentials)), number,
+            ) * 1e6
+            results[f'{stack}_asgi_jwks_us'] = _async_time_per_call(
+                lambda: asgi.get_response_async(async_factory.get(jwks)), number,
+            ) * 1e6
+
+        for metric in ('wsgi_jwks_us', 'wsgi_login_us', 'asgi_jwks_us'):
+            results[f'saved_{metric}'] = results[f'full_{metric}'] - results[f'lean_{metric}']
+    return results
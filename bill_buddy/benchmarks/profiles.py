@@ -0,0 +1,39 @@
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory
+from django.urls import reverse
+
+from bill_buddy.authentication import ClaimsRefreshToken
+from bill_buddy.benchmarks import benchmark, bulk_request_settings, time_per_call
+from bill_buddy.models import CustomUser
+from bill_buddy.profiles import forget_profile
+
+
+@benchmark('me_profile', uses_db=True)
+def me_profile(options):
+    """
+    Per-request cost of ``GET /api/me/`` with a cold profile cache, a warm
+    one, and a warm one revalidated with ``If-None-Match`` (a 304), through
+    the WSGI handler.
+    """
+    number = min(options['number'], 2000)
+    with bulk_request_settings():
+        user = CustomUser.objects.create_user('me@example.com', 'secret123', username='me', is_active=True)
+        access = str(ClaimsRefreshToken.for_user(user).access_token)
+        handler = WSGIHandler()
+        factory = RequestFactory(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('me')
+        etag = handler.get_response(factory.get(url))['ETag']
+
+        def cold():
+            forget_profile(user.pk)
+            return handler.get_response(factory.get(url))
+
+        results = {
+            'cold_us': time_per_call(cold, number) * 1e6,
+            'cached_us': time_per_call(lambda: handler.get_response(factory.get(url)), number) * 1e6,
+            'not_modified_us': time_per_call(
+                lambda: handler.get_response(factory.get(url, HTTP_IF_NONE_MATCH=etag)), number,
+            ) * 1e6,
+        }
+        assert handler.get_response(factory.get(url, HTTP_IF_NONE_MATCH=etag)).status_code == 304
+    return results
@@ -0,0 +1,49 @@
+import time
+
+from bill_buddy.benchmarks import benchmark, bulk_request_settings
+from bill_buddy.models import CustomUser
+from bill_buddy.provisioning import provision_users
+from bill_buddy.usernames import username_base
+
+
+def _rows(prefix, count):
+    return ({'email': f'{prefix}{i}@example.com', 'password': 'secret123', 'first_name': 'Bulk'} for i in range(count))
+
+
+def _one_by_one(rows):
+    # What a loop over the ORM does: a lookup per row, then a hash and insert.
+    for row in rows:
+        if not CustomUser.objects.by_email(row['email']).exists():
+            CustomUser.objects.create_user(
+                row['email'], row['password'], username=username_base(row['email']), first_name=row['first_name'],
+            )
+
+
+@benchmark('provisioning', uses_db=True)
+def provisioning(options):
+    """
+    Rows per second provisioning ``--rows`` users through
+    ``provision_users`` (plain, with verification emails queued, and as
+    invites) against ``create_user`` row by row. Passwords use MD5, so the
+    figures are the database side; with a real hasher add ``--workers``
+    processes' worth of hashing.
+    """
+    rows = max(options['rows'], 1000)
+    results = {'rows': rows}
+    with bulk_request_settings():
+        start = time.perf_counter()
+        _one_by_one(_rows('single', min(rows, 2000)))
+        results['one_by_one_rows_per_second'] = min(rows, 2000) / (time.perf_counter() - start)
+
+        for name, kwargs in (
+            ('bulk', {}),
+            ('bulk_with_verification', {'verification_base_url': 'https://app.example.com'}),
+            ('bulk_invite', {'invite': True}),
+        ):
+            stats = provision_users(_rows(name, rows), **kwargs)
+            assert stats.created == rows
+            results[f'{name}_rows_per_second'] = stats.rows_per_second
+
+        # Every row conflicts: the cost of re-running an import.
+        results['rerun_rows_per_second'] = provision_users(_rows('bulk', rows)).rows_per_second
+    return results
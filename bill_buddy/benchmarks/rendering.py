@@ -0,0 +1,31 @@
+from unittest import mock
+
+from rest_framework.renderers import JSONRenderer
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.renderers import FastJSONRenderer
+from bill_buddy.response import custom_response
+
+
+@benchmark('json_rendering')
+def json_rendering(options):
+    """Envelope rendering with DRF's JSONRenderer vs. FastJSONRenderer."""
+    responses = {
+        'static': custom_response(success=False, message="Invalid credentials", status_code=401).data,
+        'login': custom_response(message="Login successful", data={
+            'refresh': 'x' * 400,
+            'access': 'y' * 400,
+            'user': {'username': 'jane', 'email': 'jane@example.com', 'first_name': 'Jane',
+                     'last_name': 'Doe', 'gender': 'female'},
+        }).data,
+    }
+    number = options['number']
+    results = {}
+    for name, data in responses.items():
+        results[f'{name}_json_renderer_us'] = time_per_call(lambda: JSONRenderer().render(data), number) * 1e6
+        results[f'{name}_fast_renderer_us'] = time_per_call(lambda: FastJSONRenderer().render(data), number) * 1e6
+        with mock.patch('bill_buddy.renderers.orjson', None):
+            results[f'{name}_fast_renderer_stdlib_us'] = (
+                time_per_call(lambda: FastJSONRenderer().render(data), number) * 1e6
+            )
+    return results
@@ -0,0 +1,98 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.text import slugify
+
+from bill_buddy.benchmarks import benchmark, latency_summary, time_each
+from bill_buddy.models import CustomUser
+from bill_buddy.usernames import get_or_create_by_email
+
+COLLISIONS = 10_000
+
+
+def _legacy_generate_username(email):
+    # The probing loop GoogleLoginView used before the allocator: one query per suffix.
+    base = slugify(email.split("@")[0]) or "user"
+    username = base
+    counter = 1
+    while CustomUser.objects.filter(username=username).exists():
+        username = f"{base}{counter}"
+        counter += 1
+    return username
+
+
+@benchmark('social_login', uses_db=True)
+def social_login(options):
+    """First-time social logins for a base name with 10k existing ``john<n>`` usernames."""
+    CustomUser.objects.bulk_create(
+        CustomUser(email=f'john{i}@seed.example.com', username='john' if i == 0 else f'john{i}', password='!')
+        for i in range(COLLISIONS)
+    )
+    client = Client()
+    url = reverse('social-login')
+    logins = min(options['number'], 200)
+
+    samples = time_each(
+        lambda i: client.post(url, {'email': f'john@new{i}.example.com'}),
+        range(logins),
+    )
+    legacy = time_each(_legacy_generate_username, ['john@legacy.example.com'] * 3)
+    return {
+        'existing_usernames': COLLISIONS,
+        **latency_summary(samples, 'allocator_login_'),
+        'legacy_username_probe_ms': sum(legacy) / len(legacy) * 1e3,
+    }
+
+
+def _legacy_get_or_create(email):
+    # The lookup GoogleLoginView used before the single-fetch path.
+    with transaction.atomic():
+        user_qs = CustomUser.objects.filter(email=email)
+        if user_qs.exists():
+            return user_qs.get(), False
+        return CustomUser.objects.create(email=email, username=_legacy_generate_username(email)), True
+
+
+def _first_login(url, email):
+    try:
+        return Client(raise_request_exception=False).post(url, {'email': email}).status_code
+    finally:
+        connection.close()
+
+
+@benchmark('social_login_concurrency', uses_db=True, threaded=True)
+def social_login_concurrency(options):
+    """Queries per returning login, and concurrent first logins racing on one email."""
+    url = reverse('social-login')
+    CustomUser.objects.create(email='returning@example.com', username='returning')
+
+    with CaptureQueriesContext(connection) as queries:
+        get_or_create_by_email('returning@example.com')
+    with CaptureQueriesContext(connection) as legacy_queries:
+        _legacy_get_or_create('returning@example.com')
+
+    threads = 8
+    rounds = max(1, min(options['number'], 200) // threads)
+    statuses = Counter()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i in range(rounds):
+            # Every thread of a round logs in with the same unseen email.
+            email = f'racer{i}@example.com'
+            statuses.update(pool.map(lambda _: _first_login(url, email), range(threads)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'returning_lookup_queries': len(queries),
+        'legacy_returning_lookup_queries': len(legacy_queries),
+        'concurrent_logins': sum(statuses.values()),
+        'concurrent_logins_ok': statuses[200],
+        'concurrent_logins_5xx': sum(count for code, count in statuses.items() if code >= 500),
+        'users_created': CustomUser.objects.filter(email__startswith='racer').count(),
+        'concurrent_logins_per_second': sum(statuses.values()) / elapsed,
+    }
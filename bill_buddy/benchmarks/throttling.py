@@ -0,0 +1,78 @@
+import json
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.parsers import JSONParser
+
+from bill_buddy.benchmarks import benchmark, time_per_call
+from bill_buddy.throttling import (AUTH_THROTTLE_CLASSES, CacheWindowCounter, LocalWindowCounter,
+    reset_throttle_store)
+from bill_buddy.views import LoginView
+
+
+def _rates(rate):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'login_ip': rate, 'login_email': rate},
+    })
+
+
+@benchmark('throttling', uses_db=True)
+def throttling(options):
+    """
+    The throttles' own cost per request, with the in-process and a shared
+    (``default`` cache) counter store, and what a throttled login costs next
+    to one that reaches the password hasher.
+    """
+    number = options['number']
+    results = {}
+    for name, store in (('local', LocalWindowCounter(100_000)), ('cache', CacheWindowCounter('default'))):
+        keys = [f'login_ip:10.0.{i // 256}.{i % 256}' for i in range(number)]
+        results[f'{name}_hit_us'] = time_per_call(lambda: [store.hit(key, 10**9, 60) for key in keys], 1) / number * 1e6
+
+    factory = RequestFactory()
+    body = json.dumps({'email': 'jane@example.com', 'password': 'secret123'})
+    view = LoginView()
+    view.throttle_scope = LoginView.throttle_scope
+    throttles = [throttle() for throttle in AUTH_THROTTLE_CLASSES]
+
+    def parse():
+        request = Request(factory.post('/', body, content_type='application/json'), parsers=[JSONParser()])
+        request.data
+        return request
+
+    def check():
+        request = parse()
+        for throttle in throttles:
+            throttle.allow_request(request, view)
+
+    # Building and parsing the request is paid by the view anyway.
+    baseline = time_per_call(parse, number)
+    with _rates(f'{10**9}/min'):
+        for name, alias in (('local', None), ('cache', 'default')):
+            with override_settings(AUTH_THROTTLE_CACHE=alias):
+                reset_throttle_store()
+                results[f'{name}_throttles_per_request_us'] = (time_per_call(check, number) - baseline) * 1e6
+        reset_throttle_store()
+
+    # An unknown email, so the login pays for the dummy hash and no token.
+    handler = WSGIHandler()
+    url = reverse('login')
+    unknown = json.dumps({'email': 'nobody@example.com', 'password': 'secret123'})
+
+    def login():
+        return handler.get_response(factory.post(url, unknown, content_type='application/json'))
+
+    with _rates(f'{10**9}/min'):
+        results['hashed_login_us'] = time_per_call(login, 1, repeat=3) * 1e6
+    with _rates('1/day'):
+        reset_throttle_store()
+        login()
+        assert login().status_code == 429
+        results['throttled_login_us'] = time_per_call(login, min(number, 1000)) * 1e6
+    reset_throttle_store()
+    return results
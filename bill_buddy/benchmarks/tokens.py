@@ -0,0 +1,65 @@
+import random
+import secrets
+
+from django.db import connection, models
+
+from bill_buddy.benchmarks import benchmark, latency_summary, time_each
+from bill_buddy.models import CustomUser, EmailVerificationToken, hash_token
+
+
+class LegacyToken(models.Model):
+    # The token layout before hashing: the raw signed string under a unique varchar index.
+    token = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        app_label = 'bill_buddy'
+        db_table = 'bill_buddy_bench_legacy_token'
+        managed = False
+
+
+def _seed(rows, batch_size=5000):
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f'bench{i}@example.com', username=f'bench{i}', password='!')
+        for i in range(1000)
+    )
+    tokens = []
+    for start in range(0, rows, batch_size):
+        batch = [
+            f'bench{i}@example.com:1uAbCd:{secrets.token_urlsafe(32)}'
+            for i in range(start, min(rows, start + batch_size))
+        ]
+        LegacyToken.objects.bulk_create(LegacyToken(token=token) for token in batch)
+        EmailVerificationToken.objects.bulk_create(
+            EmailVerificationToken(user=users[i % len(users)], token_hash=hash_token(token))
+            for i, token in enumerate(batch)
+        )
+        tokens.extend(random.sample(batch, min(len(batch), 50)))
+    return tokens
+
+
+@benchmark('token_lookup', uses_db=True)
+def token_lookup(options):
+    """
+    Lookup latency by raw varchar token vs. 32-byte digest at ``--rows`` rows.
+
+    Runs on whatever DATABASES['default'] points at, so point DB_ENGINE at
+    Postgres to compare both backends.
+    """
+    with connection.schema_editor() as editor:
+        editor.create_model(LegacyToken)
+    try:
+        sample = _seed(options['rows'])[:options['number']]
+        random.shuffle(sample)
+
+        legacy_pks = LegacyToken.objects.values_list('pk', flat=True)
+        hashed_pks = EmailVerificationToken.objects.values_list('pk', flat=True)
+        legacy = time_each(lambda token: legacy_pks.get(token=token), sample)
+        hashed = time_each(lambda token: hashed_pks.get(token_hash=hash_token(token)), sample)
+        return {
+            'rows': options['rows'],
+            **latency_summary(legacy, 'varchar_'),
+            **latency_summary(hashed, 'sha256_'),
+        }
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(LegacyToken)
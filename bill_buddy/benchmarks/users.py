@@ -0,0 +1,39 @@
+import random
+
+from bill_buddy.benchmarks import benchmark, latency_summary, time_each
+from bill_buddy.models import CustomUser
+
+
+def seed_users(rows, batch_size=5000, prefix='seed'):
+    for start in range(0, rows, batch_size):
+        CustomUser.objects.bulk_create(
+            CustomUser(email=f'{prefix}{i}@Example.com', username=f'{prefix}{i}', password='!')
+            for i in range(start, min(rows, start + batch_size))
+        )
+
+
+def _uses_index(queryset, index_name):
+    plan = queryset.explain()
+    return int(index_name in plan or 'Index Scan' in plan or 'Index Only Scan' in plan)
+
+
+@benchmark('email_lookup', uses_db=True)
+def email_lookup(options):
+    """
+    Case-insensitive email lookup at ``--rows`` users: the LOWER(email) index
+    via ``by_email`` against ``email__iexact``, which cannot use an index.
+    """
+    rows = options['rows']
+    seed_users(rows)
+    emails = [f'SEED{random.randrange(rows)}@example.COM' for _ in range(min(options['number'], 1000))]
+
+    indexed = time_each(lambda email: CustomUser.objects.by_email(email).get(), emails)
+    iexact = time_each(lambda email: CustomUser.objects.get(email__iexact=email), emails[:50])
+    return {
+        'rows': rows,
+        'by_email_uses_index': _uses_index(
+            CustomUser.objects.by_email(emails[0]), 'bill_buddy_customuser_email_ci_unique',
+        ),
+        **latency_summary(indexed, 'by_email_'),
+        **latency_summary(iexact, 'iexact_'),
+    }
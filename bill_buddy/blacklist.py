@@ -0,0 +1,183 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+# Shared-cache keys: one per blacklisted jti, plus a marker that changes on
+# every blacklisting so processes know their Bloom filter is behind.
+_KEY = 'bill_buddy:blacklist:{}'
+_GENERATION_KEY = 'bill_buddy:blacklist:generation'
+
+# Incremental Bloom syncs re-read rows blacklisted this long before the last
+# sync, covering transactions that committed out of order.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class ExpiringLRU:
+    """A bounded, thread-safe set of keys that each expire at their own time."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, expires_at):
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter: ``key in bloom`` is never a false negative and
+    a false positive with probability ``error_rate`` once ``capacity`` keys
+    have been added.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing over two halves of one digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class BlacklistCache:
+    """
+    Answers "is this refresh token blacklisted?" mostly without the database.
+
+    Blacklisted jtis are remembered in a bounded in-process LRU until their
+    ``exp``. With a shared cache (``JWT_BLACKLIST_CACHE``), they are also
+    stored there, and a process-local Bloom filter of every unexpired
+    blacklisted jti answers negative lookups. The filter is trusted only while
+    the shared generation marker matches the one it was synced at; otherwise
+    it first catches up from ``BlacklistedToken`` rows blacklisted since the
+    last sync, and is rebuilt from scratch every
+    ``JWT_BLACKLIST_BLOOM_REBUILD`` seconds to drop expired jtis. Without a
+    shared cache, other processes' logouts are only visible in the database,
+    so negative lookups still query it.
+    """
+
+    def __init__(self):
+        self.local = ExpiringLRU(getattr(settings, 'JWT_BLACKLIST_LOCAL_SIZE', 10_000))
+        alias = getattr(settings, 'JWT_BLACKLIST_CACHE', None)
+        self.shared = caches[alias] if alias else None
+        self.bloom = None
+        self._generation = None
+        self._synced_at = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti, exp):
+        """Records a jti that was just blacklisted in the database."""
+        self._remember(jti, exp)
+        if self.shared is not None:
+            # Only announce the row once other processes can read it.
+            transaction.on_commit(lambda: self.shared.set(_GENERATION_KEY, time.time_ns(), timeout=None))
+
+    def _remember(self, jti, exp):
+        self.local.add(jti, exp)
+        if self.shared is not None:
+            self.shared.set(_KEY.format(jti), 1, timeout=max(1, int(exp - time.time())))
+
+    def is_blacklisted(self, jti, exp):
+        if jti in self.local:
+            return True
+        if self.shared is not None:
+            self._sync_bloom()
+            if jti not in self.bloom:
+                return False
+            if self.shared.get(_KEY.format(jti)):
+                self.local.add(jti, exp)
+                return True
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            self._remember(jti, exp)
+            return True
+        return False
+
+    def _sync_bloom(self):
+        generation = self.shared.get(_GENERATION_KEY)
+        if generation is None:
+            # Missing or evicted: start a new generation nobody has synced.
+            generation = time.time_ns()
+            self.shared.add(_GENERATION_KEY, generation, timeout=None)
+        if self.bloom is not None and generation == self._generation:
+            return
+        with self._lock:
+            if self.bloom is None or generation != self._generation:
+                self._sync(generation)
+
+    def _sync(self, generation):
+        now = timezone.now()
+        rebuild_every = getattr(settings, 'JWT_BLACKLIST_BLOOM_REBUILD', 3600)
+        if (self.bloom is None or self.bloom.count > self.bloom.capacity
+                or time.monotonic() - self._built_at > rebuild_every):
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            capacity = max(getattr(settings, 'JWT_BLACKLIST_BLOOM_CAPACITY', 100_000), rows.count() * 2)
+            bloom = BloomFilter(capacity, getattr(settings, 'JWT_BLACKLIST_BLOOM_ERROR_RATE', 0.001))
+            self._built_at = time.monotonic()
+        else:
+            rows = BlacklistedToken.objects.filter(blacklisted_at__gte=self._synced_at - SYNC_OVERLAP)
+            bloom = self.bloom
+        for jti in rows.values_list('token__jti', flat=True).iterator():
+            bloom.add(jti)
+        self.bloom, self._generation, self._synced_at = bloom, generation, now
+
+
+_blacklist_cache = None
+_blacklist_cache_lock = threading.Lock()
+
+
+def get_blacklist_cache():
+    global _blacklist_cache
+    if _blacklist_cache is None:
+        with _blacklist_cache_lock:
+            if _blacklist_cache is None:
+                _blacklist_cache = BlacklistCache()
+    return _blacklist_cache
+
+
+def reset_blacklist_cache():
+    """Drops the process's cache, e.g. after changing its settings in tests."""
+    global _blacklist_cache
+    with _blacklist_cache_lock:
+        _blacklist_cache = None
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .tokens import TOKEN_MAX_AGE
+
+
+@register()
+def check_resend_window(app_configs, **kwargs):
+    """A deduplicated resend reuses the link already sent, so it must outlive the window."""
+    window = getattr(settings, 'EMAIL_RESEND_WINDOW', 60)
+    if window >= TOKEN_MAX_AGE:
+        return [Error(
+            f"EMAIL_RESEND_WINDOW ({window}s) must be shorter than the token lifetime ({TOKEN_MAX_AGE}s).",
+            hint="Otherwise a resend can be dropped while the only link sent has already expired.",
+            id='bill_buddy.E001',
+        )]
+    return []
@@ -0,0 +1,99 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.template.loader import select_template
+from django.urls import get_script_prefix, reverse
+from django.utils import translation
+from django.utils.html import escape
+
+TEMPLATE_DIR = 'bill_buddy/emails'
+
+# Placeholder rendered in place of each per-user field while compiling.
+_MARK = '\x1f'
+
+
+class CompiledEmailTemplate:
+    """
+    A Django template pre-rendered down to a ``str.format`` pattern.
+
+    The template is rendered once with marker values for ``fields``; the
+    static text around the markers is kept and only the per-user values are
+    substituted on each call. Templates may therefore only use the fields as
+    plain ``{{ variables }}``, not in tags or filters.
+    """
+
+    def __init__(self, template, fields, autoescape):
+        marked = template.render({field: f'{_MARK}{field}{_MARK}' for field in fields})
+        parts = marked.split(_MARK)
+        pattern = []
+        for index, part in enumerate(parts):
+            if index % 2:
+                pattern.append(f'{{{part}}}')
+            else:
+                pattern.append(part.replace('{', '{{').replace('}', '}}'))
+        self.pattern = ''.join(pattern)
+        self.autoescape = autoescape
+
+    def render(self, context):
+        if self.autoescape:
+            context = {key: escape(value) for key, value in context.items()}
+        return self.pattern.format_map(context)
+
+
+def _candidates(filename, language):
+    names = []
+    if language:
+        language = language.lower()
+        names.append(f'{TEMPLATE_DIR}/{language}/{filename}')
+        if '-' in language:
+            names.append(f"{TEMPLATE_DIR}/{language.split('-')[0]}/{filename}")
+    names.append(f'{TEMPLATE_DIR}/{filename}')
+    return names
+
+
+@lru_cache(maxsize=64)
+def get_email_templates(name, language=None, fields=('first_name', 'url')):
+    """
+    Returns the compiled ``(subject, text, html)`` templates for ``name``.
+
+    Localised variants live in ``bill_buddy/emails/<language>/`` and fall back
+    to the base language and then to the default templates. Each
+    (name, language) pair is resolved and compiled once per process.
+    """
+    return tuple(
+        CompiledEmailTemplate(select_template(_candidates(f'{name}{suffix}', language)), fields, autoescape)
+        for suffix, autoescape in (('_subject.txt', False), ('.txt', False), ('.html', True))
+    )
+
+
+@lru_cache(maxsize=256)
+def _link_prefix(origin, script_prefix, url_name):
+    return f'{origin}{reverse(url_name)}?token='
+
+
+def build_link(origin, url_name, token):
+    """
+    Builds ``<origin><reversed url>?token=<token>``.
+
+    The reversed path is cached per origin (scheme + host) and URL name, so
+    only the token is formatted per message.
+    """
+    return _link_prefix(origin.rstrip('/'), get_script_prefix(), url_name) + token
+
+
+def request_origin(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def request_language(request=None):
+    return getattr(request, 'LANGUAGE_CODE', None) or translation.get_language() or settings.LANGUAGE_CODE
+
+
+def render_email(name, context, language=None):
+    """Renders ``(subject, text, html)`` for the per-user ``context``."""
+    subject, text, html = get_email_templates(name, language, tuple(sorted(context)))
+    return (
+        subject.render(context).strip(),
+        text.render(context),
+        html.render(context),
+    )
@@ -0,0 +1,107 @@
+import csv
+import io
+
+from asgiref.sync import sync_to_async
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from .models import TOKEN_LIFETIME, CustomUser, EmailVerificationToken, PasswordResetToken
+from .renderers import FastJSONRenderer
+
+COLUMNS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'gender', 'is_active', 'is_staff', 'date_joined',
+    'pending_email_verification', 'pending_password_reset', 'active_refresh_token',
+)
+DATE_JOINED = COLUMNS.index('date_joined')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _timestamp(value):
+    # As DRF's encoder writes datetimes, so both formats match the API's.
+    if value is None:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _users(now):
+    """Users with their token state as ``EXISTS`` subqueries, in ``COLUMNS`` order."""
+    pending_since = now - TOKEN_LIFETIME
+    return CustomUser.objects.annotate(
+        pending_email_verification=Exists(EmailVerificationToken.objects.filter(
+            user=OuterRef('pk'), used=False, created_at__gte=pending_since,
+        )),
+        pending_password_reset=Exists(PasswordResetToken.objects.filter(
+            user=OuterRef('pk'), used=False, created_at__gte=pending_since,
+        )),
+        active_refresh_token=Exists(OutstandingToken.objects.filter(
+            user=OuterRef('pk'), expires_at__gt=now, blacklistedtoken__isnull=True,
+        )),
+    ).values_list(*COLUMNS).order_by('pk')
+
+
+def export_pages(chunk_size):
+    """
+    Yields every user as lists of up to ``chunk_size`` ``COLUMNS`` tuples.
+
+    Each page is its own query resuming after the last primary key seen
+    (keyset pagination), so no query holds a cursor or a transaction open
+    for the whole export and memory stays at one page.
+    """
+    now = timezone.now()
+    users = _users(now)
+    last_pk = 0
+    while page := list(users.filter(pk__gt=last_pk)[:chunk_size].iterator(chunk_size=chunk_size)):
+        yield [(*row[:DATE_JOINED], _timestamp(row[DATE_JOINED]), *row[DATE_JOINED + 1:]) for row in page]
+        last_pk = page[-1][0]
+
+
+# Cells a spreadsheet would read as a formula (CSV injection).
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(pages):
+    """
+    A header line, then one CSV chunk per page. Text that would start a
+    formula is prefixed with ``'`` so spreadsheets show it as text.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for page in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_cell(value) for value in row] for row in page)
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(pages):
+    """One chunk of JSON lines per page."""
+    dumps = FastJSONRenderer().dumps
+    for page in pages:
+        yield b''.join(dumps(dict(zip(COLUMNS, row))) + b'\n' for row in page)
+
+
+FORMATS = {'csv': csv_chunks, 'ndjson': ndjson_chunks}
+
+
+async def aiterate(iterator):
+    """
+    ``iterator`` as an async iterator, each step run in the thread the async
+    ORM uses, so ASGI streams it instead of buffering it whole.
+    """
+    sentinel = object()
+    step = sync_to_async(next)
+    while (chunk := await step(iterator, sentinel)) is not sentinel:
+        yield chunk
@@ -0,0 +1,186 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.module_loading import import_string
+
+from .metrics import timed
+
+
+class TimedHasherMixin:
+    """Counts hashing done in a request towards its password-hash time."""
+
+    def encode(self, password, salt, *args, **kwargs):
+        with timed('hash'):
+            return super().encode(password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        with timed('hash'):
+            return super().verify(password, encoded)
+
+
+class PBKDF2PasswordHasher(TimedHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(TimedHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
+    block_size = getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', hashers.ScryptPasswordHasher.block_size)
+    parallelism = getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', hashers.ScryptPasswordHasher.parallelism)
+
+
+class Argon2PasswordHasher(TimedHasherMixin, hashers.Argon2PasswordHasher):
+    # Requires the optional argon2-cffi package.
+    time_cost = getattr(settings, 'PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+def _hasher_path(hasher):
+    return f'{type(hasher).__module__}.{type(hasher).__qualname__}'
+
+
+def _verify(hasher_path, password, encoded):
+    return import_string(hasher_path)().verify(password, encoded)
+
+
+def _encode(hasher_path, password):
+    hasher = import_string(hasher_path)()
+    return hasher.encode(password, hasher.salt())
+
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_slots
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            # Bounds the hashes waiting on the pool so a login burst queues in
+            # the request threads instead of growing the pool's backlog.
+            _pool_slots = threading.BoundedSemaphore(workers * 2)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _run(func, *args):
+    pool = _get_pool()
+    with timed('hash'):
+        if pool is None:
+            return func(*args)
+        with _pool_slots:
+            return pool.submit(func, *args).result()
+
+
+def run_dummy_hash(password):
+    """
+    Hashes ``password`` with the preferred hasher and discards the result, so
+    a login for an unknown email costs as much as a wrong password.
+    """
+    _run(_encode, _hasher_path(hashers.get_hasher('default')), password or '')
+
+
+def _check_password(encoded, password):
+    """
+    Returns ``(valid, rehashed)`` for ``password`` against the stored hash,
+    where ``rehashed`` is the password encoded with the preferred hasher if
+    the stored one is outdated, else None. Only hashes; no database access.
+
+    A user without a password to check against (social-only accounts store
+    ``''``, invitees an unusable one) costs a dummy hash, as an unknown
+    email does.
+    """
+    if password is None:
+        return False, None
+    try:
+        hasher = hashers.identify_hasher(encoded) if hashers.is_password_usable(encoded) else None
+    except ValueError:
+        hasher = None
+    if hasher is None:
+        run_dummy_hash(password)
+        return False, None
+
+    preferred = hashers.get_hasher('default')
+    if not _run(_verify, _hasher_path(hasher), password, encoded):
+        if hasher.algorithm == preferred.algorithm:
+            hasher.harden_runtime(password, encoded)
+        return False, None
+
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, _run(_encode, _hasher_path(preferred), password)
+    return True, None
+
+
+def verify_password(user, password):
+    """
+    ``user.check_password`` with the hash offloaded to the hashing pool.
+
+    When ``PASSWORD_HASH_WORKERS`` is set, the hash runs in a bounded process
+    pool so slow hashers don't hold the request thread's GIL. A correct
+    password stored with an outdated hasher or parameters is rehashed with
+    the preferred hasher and saved, as ``check_password`` does.
+    """
+    valid, rehashed = _check_password(user.password, password)
+    if rehashed:
+        user.password = rehashed
+        user.save(update_fields=['password'])
+    return valid
+
+
+@contextmanager
+def bulk_hashing_pool(workers):
+    """
+    A process pool of ``workers`` for ``hash_passwords``, shut down on exit;
+    None (hash inline) for fewer than two workers. Unlike the
+    ``PASSWORD_HASH_WORKERS`` pool it has no slots: a bulk job keeps it full.
+    """
+    if workers < 2:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        yield pool
+
+
+def hash_passwords(passwords, pool=None, chunksize=16):
+    """Encodes ``passwords`` with the preferred hasher, in order, across ``pool`` if given."""
+    path = _hasher_path(hashers.get_hasher('default'))
+    if pool is None:
+        return [_encode(path, password) for password in passwords]
+    return list(pool.map(_encode, repeat(path), passwords, chunksize=chunksize))
+
+
+# The async variants hash in a worker thread (or the pool behind it) so the
+# event loop, and the thread the async ORM runs queries on, are never blocked.
+
+async def averify_password(user, password):
+    valid, rehashed = await sync_to_async(_check_password, thread_sensitive=False)(user.password, password)
+    if rehashed:
+        user.password = rehashed
+        await user.asave(update_fields=['password'])
+    return valid
+
+
+async def arun_dummy_hash(password):
+    await sync_to_async(run_dummy_hash, thread_sensitive=False)(password)
+
+
+async def amake_password(password):
+    return await sync_to_async(hashers.make_password, thread_sensitive=False)(password)
@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import json
+from functools import cached_property, lru_cache
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from jwt import ExpiredSignatureError, InvalidAlgorithmError, InvalidTokenError
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenBackendExpiredToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.state import token_backend as hmac_token_backend
+
+# The members RFC 7638 hashes into a key's thumbprint, per key type.
+_THUMBPRINT_MEMBERS = {'RSA': ('e', 'kty', 'n'), 'OKP': ('crv', 'kty', 'x')}
+
+
+def _thumbprint(jwk):
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk['kty']]}
+    digest = hashlib.sha256(json.dumps(members, separators=(',', ':'), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def _etag(body):
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+EMPTY_JWKS = b'{"keys":[]}'
+EMPTY_JWKS_ETAG = _etag(EMPTY_JWKS)
+
+
+class SigningKey:
+    """A parsed private key with its public half, algorithm and ``kid``."""
+
+    def __init__(self, pem):
+        # Requires the optional cryptography package.
+        try:
+            from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key
+        except ImportError:
+            raise ImproperlyConfigured("JWT_PRIVATE_KEYS requires the cryptography package.")
+
+        self.private_key = load_pem_private_key(pem.encode() if isinstance(pem, str) else pem, password=None)
+        self.public_key = self.private_key.public_key()
+        if isinstance(self.private_key, rsa.RSAPrivateKey):
+            self.algorithm = 'RS256'
+            jwk = RSAAlgorithm.to_jwk(self.public_key, as_dict=True)
+        elif isinstance(self.private_key, ed25519.Ed25519PrivateKey):
+            self.algorithm = 'EdDSA'
+            jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            raise ImproperlyConfigured("JWT_PRIVATE_KEYS must be RSA or Ed25519 keys.")
+        self.kid = _thumbprint(jwk)
+        self.jwk = {**jwk, 'kid': self.kid, 'alg': self.algorithm, 'use': 'sig'}
+
+
+class KeyRing:
+    """
+    The configured signing keys: the first one signs, all of them verify.
+
+    Keys are parsed once; the JWKS document and its ETag are serialized once.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.active = keys[0]
+        self.by_kid = {key.kid: key for key in keys}
+
+    @cached_property
+    def jwks(self):
+        return json.dumps({'keys': [key.jwk for key in self.keys]}, separators=(',', ':')).encode()
+
+    @cached_property
+    def etag(self):
+        return _etag(self.jwks)
+
+    @cached_property
+    def backend(self):
+        return KeyRingTokenBackend(self)
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Signs with the ring's active key under its ``kid`` and verifies with
+    whichever ring key the token's ``kid`` header names.
+    """
+
+    def __init__(self, ring):
+        super().__init__(
+            ring.active.algorithm,
+            ring.active.private_key,
+            audience=api_settings.AUDIENCE,
+            issuer=api_settings.ISSUER,
+            leeway=api_settings.LEEWAY,
+            json_encoder=api_settings.JSON_ENCODER,
+        )
+        self.ring = ring
+
+    def encode(self, payload):
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+        key = self.ring.active
+        return jwt.encode(
+            jwt_payload,
+            key.private_key,
+            algorithm=key.algorithm,
+            headers={'kid': key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            key = self.ring.by_kid.get(jwt.get_unverified_header(token).get('kid'))
+            if key is None:
+                raise TokenBackendError("Token is invalid")
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except InvalidAlgorithmError as ex:
+            raise TokenBackendError("Invalid algorithm specified") from ex
+        except ExpiredSignatureError as ex:
+            raise TokenBackendExpiredToken("Token is expired") from ex
+        except InvalidTokenError as ex:
+            raise TokenBackendError("Token is invalid") from ex
+
+
+@lru_cache(maxsize=4)
+def _load_key_ring(pems):
+    return KeyRing([SigningKey(pem) for pem in pems]) if pems else None
+
+
+def get_key_ring():
+    """The ``KeyRing`` for ``JWT_PRIVATE_KEYS``, or None when tokens use HS256."""
+    return _load_key_ring(tuple(getattr(settings, 'JWT_PRIVATE_KEYS', ())))
+
+
+def get_token_backend():
+    ring = get_key_ring()
+    return hmac_token_backend if ring is None else ring.backend
+
+
+def jwks_document():
+    """Returns the serialized public JWKS and its strong ETag."""
+    ring = get_key_ring()
+    if ring is None:
+        return EMPTY_JWKS, EMPTY_JWKS_ETAG
+    return ring.jwks, ring.etag
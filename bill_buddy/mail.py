@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .metrics import timed
+
+
+class DispatchStats:
+    def __init__(self):
+        self.messages_sent = 0
+        self.batches = 0
+        self.connection_opens = 0
+        self.send_seconds = 0.0
+
+    @property
+    def messages_per_second(self):
+        if not self.send_seconds:
+            return 0.0
+        return self.messages_sent / self.send_seconds
+
+    def as_dict(self):
+        return {
+            'messages_sent': self.messages_sent,
+            'batches': self.batches,
+            'connection_opens': self.connection_opens,
+            'send_seconds': round(self.send_seconds, 6),
+            'messages_per_second': round(self.messages_per_second, 2),
+        }
+
+
+class MailDispatcher:
+    """
+    Sends ``EmailMessage`` batches over one long-lived backend connection.
+
+    The connection is opened lazily, reused across ``send_messages`` calls and
+    re-opened once it has been idle for longer than ``idle_timeout`` seconds
+    (SMTP servers drop idle clients). Any send error closes it so the next
+    batch starts from a fresh connection.
+    """
+
+    def __init__(self, backend=None, idle_timeout=None):
+        self.backend = backend
+        if idle_timeout is None:
+            idle_timeout = getattr(settings, 'EMAIL_CONNECTION_IDLE_TIMEOUT', 30)
+        self.idle_timeout = idle_timeout
+        self.stats = DispatchStats()
+        self._connection = None
+        self._last_used = 0.0
+
+    def _get_connection(self):
+        if self._connection is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._connection is None:
+            connection = get_connection(self.backend, fail_silently=False)
+            connection.open()
+            self._connection = connection
+            self.stats.connection_opens += 1
+        return self._connection
+
+    def send_messages(self, messages):
+        messages = list(messages)
+        if not messages:
+            return 0
+
+        connection = self._get_connection()
+        start = time.monotonic()
+        try:
+            with timed('email'):
+                sent = connection.send_messages(messages) or 0
+        except Exception:
+            self.close()
+            raise
+        finally:
+            self._last_used = time.monotonic()
+            self.stats.send_seconds += self._last_used - start
+
+        self.stats.messages_sent += sent
+        self.stats.batches += 1
+        return sent
+
+    def close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_local = threading.local()
+
+
+def get_dispatcher():
+    """Returns the calling thread's shared dispatcher."""
+    dispatcher = getattr(_local, 'dispatcher', None)
+    if dispatcher is None:
+        dispatcher = _local.dispatcher = MailDispatcher()
+    return dispatcher
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from bill_buddy.benchmarks import find_regressions, load_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Runs the bill_buddy benchmarks against throwaway test databases."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Benchmarks to run (default: all).")
+        parser.add_argument('--list', action='store_true', help="List the available benchmarks and exit.")
+        parser.add_argument('--number', type=int, default=1000, help="Iterations per timing loop.")
+        parser.add_argument('--rows', type=int, default=100_000, help="Rows to seed for database benchmarks.")
+        parser.add_argument('--save-baseline', metavar='PATH', help="Write the results to a baseline JSON file.")
+        parser.add_argument('--baseline', metavar='PATH', help="Fail if results regress against this baseline.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help="Allowed relative slowdown against the baseline for timings and throughput (default 0.5).",
+        )
+
+    def handle(self, *args, **options):
+        benchmarks = load_benchmarks()
+        if options['list']:
+            for name in sorted(benchmarks):
+                self.stdout.write(name)
+            return
+
+        names = options['names'] or sorted(benchmarks)
+        unknown = set(names) - set(benchmarks)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            vendor = connections['default'].vendor
+            if baseline['database'] != vendor:
+                raise CommandError(f"The baseline was recorded on {baseline['database']}, not {vendor}.")
+
+        setup_test_environment()
+        collected = {}
+        old_config = None
+        if any(benchmarks[name].uses_db for name in names):
+            if any(benchmarks[name].threaded for name in names):
+                self._use_sqlite_files()
+            old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for name in names:
+                try:
+                    results = benchmarks[name](options)
+                finally:
+                    if benchmarks[name].uses_db:
+                        self._flush()
+                for metric, value in results.items():
+                    collected[f'{name}.{metric}'] = value
+                    value = value if isinstance(value, int) else f"{value:.3f}"
+                    self.stdout.write(f"{name}.{metric}: {value}")
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump({'database': connections['default'].vendor, 'results': collected}, f, indent=2, sort_keys=True)
+                f.write('\n')
+        if baseline is not None:
+            regressions = find_regressions(baseline['results'], collected, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressed against the baseline:\n" + '\n'.join(regressions))
+            self.stdout.write("No regressions against the baseline.")
+
+    def _flush(self):
+        # Each benchmark seeds its own rows, so the next one starts from empty
+        # tables. Threaded benchmarks commit from several connections, which
+        # rules out rolling a transaction back instead.
+        for connection in connections.all():
+            call_command('flush', database=connection.alias, interactive=False, verbosity=0)
+
+    def _use_sqlite_files(self):
+        # In-memory SQLite test databases use a shared cache, whose table
+        # locks fail immediately instead of waiting out the busy timeout.
+        for connection in connections.all():
+            test_settings = connection.settings_dict['TEST']
+            if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+                test_settings['NAME'] = os.path.join(tempfile.gettempdir(), f'bill_buddy_bench_{connection.alias}.sqlite3')
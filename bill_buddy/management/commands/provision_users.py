@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bill_buddy.provisioning import FORMATS, provision_users, read_rows
+
+
+class Command(BaseCommand):
+    help = "Creates users in bulk from a CSV or JSON-lines file, streaming it batch by batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help="Input format (defaults to the file extension, csv for stdin).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows validated, hashed and inserted per batch.")
+        parser.add_argument('--workers', type=int, default=0,
+                            help="Processes hashing passwords (hashes inline below 2).")
+        parser.add_argument('--invite', action='store_true',
+                            help="Give every user an unusable password, to be set via password reset.")
+        parser.add_argument('--active', action='store_true',
+                            help="Create the users active (verified) instead of pending verification.")
+        parser.add_argument('--send-verification', metavar='BASE_URL', default=None,
+                            help="Queue verification emails to the new users, with links on this scheme and host.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if options['active'] and options['send_verification']:
+            raise CommandError("--send-verification is for inactive users; drop --active.")
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats.rows} rows: {stats.created} created, {stats.skipped} skipped, "
+                f"{stats.invalid} invalid ({stats.rows_per_second:.0f} rows/s)."
+            )
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            stats = provision_users(
+                read_rows(stream, format),
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                invite=options['invite'],
+                active=options['active'],
+                verification_base_url=options['send_verification'],
+                progress=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Provisioned {stats.created} of {stats.rows} user(s) in {stats.batches} batch(es), "
+            f"{stats.emails_queued} verification email(s) queued, "
+            f"{stats.seconds:.2f}s ({stats.rows_per_second:.0f} rows/s)."
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from bill_buddy.reaper import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired verification/reset tokens and expired JWT blacklist rows in small chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between chunks.")
+
+    def handle(self, *args, **options):
+        for result in purge_expired(chunk_size=options['chunk_size'], pause=options['pause']):
+            self.stdout.write(
+                f"Deleted {result.deleted} expired {result.label} "
+                f"in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)."
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from bill_buddy.utils import resend_verification_emails
+
+
+class Command(BaseCommand):
+    help = "Queues fresh verification emails for inactive users who joined recently."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', required=True,
+                            help="Scheme and host used to build the verification links.")
+        parser.add_argument('--hours', type=int, default=24,
+                            help="Only users who joined within this many hours.")
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help="Users fetched and emails queued per batch.")
+
+    def handle(self, *args, **options):
+        queued = resend_verification_emails(
+            options['base_url'],
+            hours=options['hours'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {queued} verification email(s); send_queued_emails delivers them."
+        ))
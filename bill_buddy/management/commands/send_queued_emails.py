@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bill_buddy.mail import get_dispatcher
+from bill_buddy.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends queued outbound emails in batches over a reused mail connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Emails per batch (defaults to EMAIL_OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the outbox instead of exiting once it is empty.")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Seconds to sleep between polls when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = drain_outbox(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} email(s), {failed} failed.")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        dispatcher = get_dispatcher()
+        dispatcher.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox drained: {total_sent} sent, {total_failed} failed "
+            f"({dispatcher.stats.connection_opens} connection(s) opened, "
+            f"{dispatcher.stats.messages_per_second:.1f} msg/s)."
+        ))
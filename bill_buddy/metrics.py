@@ -0,0 +1,196 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Upper bounds (seconds) of the request duration histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Method labels; anything else a client sends is counted as "other", so
+# made-up methods can't add series without bound.
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+_current = ContextVar('bill_buddy_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request spent, filled in while it runs."""
+
+    __slots__ = ('db_queries', 'db_seconds', 'hash_seconds', 'email_seconds', '_timing')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.email_seconds = 0.0
+        self._timing = set()
+
+
+@contextmanager
+def timed(kind):
+    """
+    Adds the block's wall time to the current request's ``<kind>_seconds``.
+
+    A no-op outside a request, and nested blocks of the same kind (a hasher's
+    ``verify`` calling its ``encode``) are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or kind in metrics._timing:
+        yield
+        return
+    metrics._timing.add(kind)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._timing.discard(kind)
+        setattr(metrics, f'{kind}_seconds', getattr(metrics, f'{kind}_seconds') + time.perf_counter() - start)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    A ``connection.execute_wrapper`` counting and timing queries run on
+    behalf of the current request; installed on every new connection.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_seconds += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class MetricsRegistry:
+    """Per (view, method) totals for this process, rendered as Prometheus text."""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, seconds, metrics):
+        with self._lock:
+            series = self._series.get((view, method))
+            if series is None:
+                series = self._series[(view, method)] = [0, 0.0, [0] * len(BUCKETS), 0, 0.0, 0.0, 0.0]
+            series[0] += 1
+            series[1] += seconds
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series[2][index] += 1
+                    break
+            series[3] += metrics.db_queries
+            series[4] += metrics.db_seconds
+            series[5] += metrics.hash_seconds
+            series[6] += metrics.email_seconds
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def requests_and_queries(self, view, method):
+        """The number of requests recorded for a view and the queries they ran."""
+        with self._lock:
+            series = self._series.get((view, method))
+            return (series[0], series[3]) if series else (0, 0)
+
+    def render(self):
+        with self._lock:
+            series = sorted((key, [*values[:2], list(values[2]), *values[3:]]) for key, values in self._series.items())
+
+        lines = [
+            '# HELP bill_buddy_request_duration_seconds Wall time per request.',
+            '# TYPE bill_buddy_request_duration_seconds histogram',
+        ]
+        for (view, method), (count, total, buckets, *_) in series:
+            labels = f'view="{view}",method="{method}"'
+            cumulative = 0
+            for bound, hits in zip(BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'bill_buddy_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'bill_buddy_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'bill_buddy_request_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'bill_buddy_request_duration_seconds_count{{{labels}}} {count}')
+
+        for index, name, help_text in (
+            (3, 'bill_buddy_db_queries_total', 'Database queries run by requests.'),
+            (4, 'bill_buddy_db_query_seconds_total', 'Time requests spent in database queries.'),
+            (5, 'bill_buddy_password_hash_seconds_total', 'Time requests spent hashing passwords.'),
+            (6, 'bill_buddy_email_send_seconds_total', 'Time requests spent sending email.'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (view, method), values in series:
+                lines.append(f'{name}{{view="{view}",method="{method}"}} {values[index]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Records each request's wall time, DB queries and time, password-hash
+    time and email-send time into ``registry``, labelled by view name.
+
+    With ``REQUEST_METRICS_SERVER_TIMING`` the request's figures are also
+    returned in a ``Server-Timing`` header. ``REQUEST_METRICS = False``
+    removes the middleware altogether.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', False)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, seconds):
+        match = request.resolver_match
+        method = request.method if request.method in METHODS else 'other'
+        registry.observe(match.view_name if match else 'unmatched', method, seconds, metrics)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={seconds * 1e3:.2f}, '
+                f'db;dur={metrics.db_seconds * 1e3:.2f};desc="{metrics.db_queries} queries", '
+                f'hash;dur={metrics.hash_seconds * 1e3:.2f}, '
+                f'email;dur={metrics.email_seconds * 1e3:.2f}'
+            )
+        return response
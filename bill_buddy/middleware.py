@@ -0,0 +1,91 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BrowserMiddleware:
+    """
+    Runs the ``BROWSER_MIDDLEWARE`` stack (sessions, CSRF, auth, messages,
+    clickjacking) for every request except those under one of the
+    ``STATELESS_PATH_PREFIXES``.
+
+    The JWT-authenticated JSON API has no use for cookies or messages, so its
+    requests skip that work; the admin keeps the full stack. The wrapped
+    middleware's ``process_view``, ``process_exception`` and
+    ``process_template_response`` hooks are forwarded for scoped requests.
+    They must be sync and async capable, as Django's own middleware are.
+    Under ASGI the hooks are coroutines, so stateless requests don't pay for
+    the thread hop Django would add to call them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixes = tuple(getattr(settings, 'STATELESS_PATH_PREFIXES', ()))
+
+        handler = get_response
+        self.view_hooks = []
+        self.exception_hooks = []
+        self.template_response_hooks = []
+        for path in reversed(getattr(settings, 'BROWSER_MIDDLEWARE', ())):
+            middleware = import_string(path)(handler)
+            if hasattr(middleware, 'process_view'):
+                self.view_hooks.insert(0, middleware.process_view)
+            if hasattr(middleware, 'process_exception'):
+                self.exception_hooks.append(middleware.process_exception)
+            if hasattr(middleware, 'process_template_response'):
+                self.template_response_hooks.append(middleware.process_template_response)
+            handler = middleware
+        self.scoped = handler
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+            self.process_exception = self.aprocess_exception
+            self.process_template_response = self.aprocess_template_response
+
+    def applies_to(self, request):
+        return not request.path_info.startswith(self.prefixes)
+
+    def __call__(self, request):
+        if self.applies_to(request):
+            return self.scoped(request)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.applies_to(request):
+            for hook in self.view_hooks:
+                response = hook(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+        return None
+
+    def process_exception(self, request, exception):
+        if self.applies_to(request):
+            for hook in self.exception_hooks:
+                response = hook(request, exception)
+                if response is not None:
+                    return response
+        return None
+
+    def process_template_response(self, request, response):
+        if self.applies_to(request):
+            for hook in self.template_response_hooks:
+                response = hook(request, response)
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.applies_to(request):
+            return await sync_to_async(type(self).process_view)(self, request, view_func, view_args, view_kwargs)
+        return None
+
+    async def aprocess_exception(self, request, exception):
+        if self.applies_to(request):
+            return await sync_to_async(type(self).process_exception)(self, request, exception)
+        return None
+
+    async def aprocess_template_response(self, request, response):
+        if self.applies_to(request):
+            return await sync_to_async(type(self).process_template_response)(self, request, response)
+        return response
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_buddy', '0002_outboundemail'),
+    ]
+
+    operations = [
+        # Added without a default, so existing accounts, whose join date is
+        # unknown, stay null instead of all getting the migration's time.
+        migrations.AddField(
+            model_name='customuser',
+            name='date_joined',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='date_joined',
+            field=models.DateTimeField(default=django.utils.timezone.now, null=True),
+        ),
+    ]
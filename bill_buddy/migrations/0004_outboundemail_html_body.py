@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_buddy', '0003_customuser_date_joined'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='html_body',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_tokens(apps, schema_editor):
+    for model_name in ('EmailVerificationToken', 'PasswordResetToken'):
+        model = apps.get_model('bill_buddy', model_name)
+        batch = []
+        for row in model.objects.only('pk', 'token').iterator(chunk_size=2000):
+            row.token_hash = hashlib.sha256(row.token.encode()).digest()
+            batch.append(row)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ['token_hash'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['token_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_buddy', '0004_outboundemail_html_body'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailverificationtoken',
+            name='token_hash',
+            field=models.BinaryField(max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='passwordresettoken',
+            name='token_hash',
+            field=models.BinaryField(max_length=32, null=True),
+        ),
+        migrations.RunPython(hash_existing_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+def delete_tokens(apps, schema_editor):
+    # Raw tokens cannot be recovered from their digests; outstanding links
+    # have to be re-requested after rolling back.
+    apps.get_model('bill_buddy', 'EmailVerificationToken').objects.all().delete()
+    apps.get_model('bill_buddy', 'PasswordResetToken').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bill_buddy', '0005_token_hash'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='emailverificationtoken',
+            name='token',
+        ),
+        migrations.RemoveField(
+            model_name='passwordresettoken',
+            name='token',
+        ),
+        migrations.RunPython(migrations.RunPython.noop, delete_tokens),
+        migrations.AlterField(
+            model_name='emailverificationtoken',
+            name='token_hash',
+            field=models.BinaryField(max_length=32, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='passwordresettoken',
+            name='token_hash',
+            field=models.BinaryField(max_length=32, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='emailverificationtoken',
+            index=models.Index(fields=['user', 'used', 'created_at'], name='bill_buddy__user_id_65cce5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresettoken',
+            index=models.Index(fields=['user', 'used', 'created_at'], name='bill_buddy__user_id_3893f1_idx'),
+        ),
+    ]
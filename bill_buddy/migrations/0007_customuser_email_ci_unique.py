@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:32
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_duplicates(apps, schema_editor):
+    # The index is computed from the existing column, so there is nothing to
+    # backfill, but accounts differing only in email case have to be merged
+    # by hand before it can be created.
+    CustomUser = apps.get_model('bill_buddy', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.values(email_lower=Lower('email'))
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Cannot add the case-insensitive email index, these emails belong to "
+            "several accounts: " + ", ".join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bill_buddy', '0006_remove_raw_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='bill_buddy_customuser_email_ci_unique'),
+        ),
+    ]
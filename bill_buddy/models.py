@@ -1,8 +1,19 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.utils import timezone
+from .hashers import amake_password
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager, PermissionsMixin,
     Group, Permission)
 
-class CustomUserManager(BaseUserManager):
+
+class CustomUserQuerySet(models.QuerySet):
+    def by_email(self, email):
+        """Case-insensitive email match, served by the unique LOWER(email) index."""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=Lower(Value(email)))
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError("Email is required")
@@ -17,6 +28,9 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", True)
         return self.create_user(email, password, **extra_fields)
 
+    def get_by_natural_key(self, email):
+        return self.by_email(email).get()
+
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     GENDER_CHOICES = (
         ('male', 'Male'),
@@ -47,35 +61,132 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    # Null for accounts created before the column was added.
+    date_joined = models.DateTimeField(default=timezone.now, null=True)
+    # Bumped whenever issued JWTs must stop working (see save()).
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'email'  # Still login via email
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']  # <-- include username here
+    # Fields exposed to clients as the user's profile
+    PROFILE_FIELDS = ('username', 'email', 'first_name', 'last_name', 'gender')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='bill_buddy_customuser_email_ci_unique'),
+        ]
 
     def __str__(self):
         return self.email
 
+    async def aset_password(self, raw_password):
+        """``set_password`` with the hashing done off the event loop."""
+        self.password = await amake_password(raw_password)
+        self._password = raw_password
+
+    # is_active as loaded from the database, to spot deactivations on save.
+    _loaded_is_active = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._loaded_is_active = user.__dict__.get('is_active')
+        return user
+
+    def save(self, *args, **kwargs):
+        """
+        Bumps ``token_version`` when the password is changed through
+        ``set_password`` or the user is deactivated, which revokes every JWT
+        issued before. Bulk ``update()`` calls bypass this and must bump the
+        version themselves.
+        """
+        if self.pk and (self._password is not None or (self._loaded_is_active and not self.is_active)):
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+
 
 from django.conf import settings
-from django.utils import timezone
+import hashlib
+
+from .tokens import TOKEN_LIFETIME
+
+
+def hash_token(token):
+    """Fixed-width SHA-256 digest stored and indexed in place of the raw token."""
+    return hashlib.sha256((token or '').encode()).digest()
+
+
+class OneTimeTokenQuerySet(models.QuerySet):
+    def expired(self, now=None):
+        return self.filter(created_at__lt=(now or timezone.now()) - TOKEN_LIFETIME)
+
 
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='password_reset_tokens')
-    token = models.CharField(max_length=255, unique=True)
+    token_hash = models.BinaryField(max_length=32, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
 
+    objects = OneTimeTokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'used', 'created_at']),
+        ]
+
     def is_expired(self):
-        # Token is valid for 24 hours
-        return (timezone.now() - self.created_at).total_seconds() > 60 * 5
+        return timezone.now() - self.created_at > TOKEN_LIFETIME
 
 # models.py
 class EmailVerificationToken(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='email_verification_tokens')
-    token = models.CharField(max_length=255, unique=True)
+    token_hash = models.BinaryField(max_length=32, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
 
+    objects = OneTimeTokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'used', 'created_at']),
+        ]
+
     def is_expired(self):
-        return (timezone.now() - self.created_at).total_seconds() > 60 * 5
+        return timezone.now() - self.created_at > TOKEN_LIFETIME
+
+
+class OutboundEmail(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .mail import get_dispatcher
+from .metrics import timed
+from .models import OutboundEmail
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """
+    Stores an email in the outbox instead of sending it.
+
+    The row is written in the caller's transaction, so it is only picked up by
+    the worker (``manage.py send_queued_emails``) once the request commits.
+    Within a request, the enqueue is what counts as its email-send time.
+    """
+    with timed('email'):
+        return OutboundEmail.objects.create(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
+
+
+async def aenqueue_email(subject, message, recipient_list, from_email=None, html_message=None):
+    """``enqueue_email`` for async views; the row is committed on its own."""
+    with timed('email'):
+        return await OutboundEmail.objects.acreate(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
+
+
+def enqueue_emails(messages, from_email=None):
+    """
+    ``enqueue_email`` for many ``(subject, message, recipient_list,
+    html_message)`` tuples at once: a single bulk insert.
+    """
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email,
+            to=list(recipient_list),
+        )
+        for subject, message, recipient_list, html_message in messages
+    ])
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size):
+    """
+    Leases up to ``batch_size`` due emails to the calling worker.
+
+    Claimed rows get their attempt counter bumped and ``next_attempt_at`` pushed
+    out by the retry delay, so a crashed worker's batch is retried later and a
+    second worker never picks up the same rows.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = OutboundEmail.objects.filter(
+            status=OutboundEmail.STATUS_PENDING,
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        batch = list(queryset[:batch_size])
+
+        for email in batch:
+            email.attempts += 1
+            email.next_attempt_at = now + _retry_delay(email.attempts)
+        OutboundEmail.objects.bulk_update(batch, ['attempts', 'next_attempt_at'])
+    return batch
+
+
+def _mark_failed(email, error):
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = OutboundEmail.STATUS_FAILED
+    email.save(update_fields=['status', 'last_error'])
+
+
+def _message(email):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def drain_outbox(batch_size=None):
+    """
+    Sends one batch of queued emails in a single ``send_messages`` call over
+    the shared dispatcher connection.
+
+    If that call fails, which of its messages went out is unknown, so each
+    is sent again on its own to tell the failing rows from the others. The
+    ones sent before the error are delivered twice; like a worker crashing
+    mid-batch, that is the outbox's at-least-once delivery.
+
+    Returns a ``(sent, failed)`` tuple. Failed emails stay pending and are
+    retried with exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS``.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    dispatcher = get_dispatcher()
+    messages = [_message(email) for email in batch]
+    try:
+        dispatcher.send_messages(messages)
+    except Exception as exc:
+        if len(batch) == 1:
+            _mark_failed(batch[0], exc)
+            return 0, 1
+        sent_ids = []
+        for email, message in zip(batch, messages):
+            try:
+                dispatcher.send_messages([message])
+            except Exception as exc:
+                _mark_failed(email, exc)
+            else:
+                sent_ids.append(email.pk)
+    else:
+        sent_ids = [email.pk for email in batch]
+
+    if sent_ids:
+        OutboundEmail.objects.filter(pk__in=sent_ids).update(
+            status=OutboundEmail.STATUS_SENT,
+            sent_at=timezone.now(),
+            last_error='',
+        )
+    return len(sent_ids), len(batch) - len(sent_ids)
@@ -0,0 +1,114 @@
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from .renderers import FastJSONRenderer
+from .serializers import UserSerializer
+
+User = get_user_model()
+
+
+def _profile_cache():
+    return caches[getattr(settings, 'PROFILE_CACHE', 'default')]
+
+
+def _profile_key(user_id):
+    return f'bill_buddy:profile:{user_id}'
+
+
+def _generation_key(user_id):
+    return f'bill_buddy:profile-generation:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+
+
+def _serialize(user):
+    data = UserSerializer(user).data
+    return dict(data), f'"{hashlib.sha256(FastJSONRenderer().dumps(data)).hexdigest()}"'
+
+
+# Profiles are cached as ``(generation, profile)`` and only served while the
+# user's generation is current. ``forget_profile`` starts a new generation,
+# so a profile loaded before an update and cached after it (a cold read
+# racing a PATCH) is never served. A new generation is random rather than a
+# counter, so one evicted from the cache can't revive older entries.
+
+def _new_generation(cache, user_id):
+    cache.add(_generation_key(user_id), secrets.token_hex(8), _timeout())
+    return cache.get(_generation_key(user_id))
+
+
+def _lookup(cache, user_id):
+    """Returns ``(profile, generation)``, the profile None unless cached for the current generation."""
+    key, generation_key = _profile_key(user_id), _generation_key(user_id)
+    found = cache.get_many([key, generation_key])
+    generation = found.get(generation_key) or _new_generation(cache, user_id)
+    entry = found.get(key)
+    if entry is not None and generation is not None and entry[0] == generation:
+        return entry[1], generation
+    return None, generation
+
+
+def _store(cache, user, generation):
+    profile = _serialize(user)
+    cache.set(_profile_key(user.pk), (generation, profile), _timeout())
+    return profile
+
+
+def profile_for(user):
+    """
+    Returns ``(data, etag)``: ``user``'s serialized profile and its strong
+    ETag, from the cache or serialized from ``user`` and cached.
+    """
+    cache = _profile_cache()
+    profile, generation = _lookup(cache, user.pk)
+    return profile or _store(cache, user, generation)
+
+
+def cached_profile(user_id):
+    """
+    ``profile_for`` by primary key, loading the user only on a cache miss.
+    Returns None for a missing user.
+
+    Profiles are cached for ``PROFILE_CACHE_TIMEOUT`` seconds and dropped
+    from the cache whenever a user is saved or deleted.
+    """
+    cache = _profile_cache()
+    profile, generation = _lookup(cache, user_id)
+    if profile is None:
+        user = User.objects.filter(pk=user_id).only(*User.PROFILE_FIELDS).first()
+        if user is not None:
+            profile = _store(cache, user, generation)
+    return profile
+
+
+def store_profile(user):
+    """Serializes and caches ``user``'s profile as it is now, e.g. after an update."""
+    cache = _profile_cache()
+    return _store(cache, user, cache.get(_generation_key(user.pk)) or _new_generation(cache, user.pk))
+
+
+async def aprofile_for(user):
+    """``profile_for`` for async views."""
+    cache = _profile_cache()
+    key, generation_key = _profile_key(user.pk), _generation_key(user.pk)
+    found = await cache.aget_many([key, generation_key])
+    generation = found.get(generation_key)
+    if generation is None:
+        await cache.aadd(generation_key, secrets.token_hex(8), _timeout())
+        generation = await cache.aget(generation_key)
+    entry = found.get(key)
+    if entry is not None and generation is not None and entry[0] == generation:
+        return entry[1]
+    profile = _serialize(user)
+    await cache.aset(key, (generation, profile), _timeout())
+    return profile
+
+
+def forget_profile(user_id):
+    _profile_cache().set(_generation_key(user_id), secrets.token_hex(8), _timeout())
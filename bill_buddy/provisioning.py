@@ -0,0 +1,208 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .hashers import bulk_hashing_pool, hash_passwords
+from .models import CustomUser
+from .usernames import next_suffix, username_base
+from .utils import enqueue_verification_emails
+
+FORMATS = ('csv', 'jsonl')
+GENDERS = {value for value, _ in CustomUser.GENDER_CHOICES}
+USERNAME_MAX_LENGTH = CustomUser._meta.get_field('username').max_length
+
+
+def read_rows(stream, format):
+    """
+    Yields one record per row of ``stream``: CSV with a header row, or one
+    JSON object per line. Nothing is read ahead of the consumer. A line that
+    isn't valid JSON yields None, which ``provision_users`` counts as invalid.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+class ProvisionStats:
+    __slots__ = ('rows', 'created', 'skipped', 'invalid', 'emails_queued', 'batches', 'seconds')
+
+    def __init__(self):
+        self.rows = self.created = self.skipped = self.invalid = 0
+        self.emails_queued = self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else ''
+
+
+class _Batch:
+    """One batch of rows, validated and checked against the table in bulk."""
+
+    def __init__(self, rows, stats):
+        self.stats = stats
+        self.rows = {}
+        for row in rows:
+            if not isinstance(row, dict):
+                stats.invalid += 1
+                continue
+            email = _clean(row.get('email'))
+            try:
+                validate_email(email)
+            except ValidationError:
+                stats.invalid += 1
+                continue
+            if len(_clean(row.get('username'))) > USERNAME_MAX_LENGTH:
+                stats.invalid += 1
+                continue
+            email = CustomUser.objects.normalize_email(email)
+            if email.lower() in self.rows:
+                stats.skipped += 1
+                continue
+            self.rows[email.lower()] = (email, row)
+
+    def drop_existing(self):
+        """Skips rows whose email is taken, whatever its case: one query."""
+        taken = set(
+            CustomUser.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=list(self.rows))
+            .values_list('email_lower', flat=True)
+        )
+        for key in taken & self.rows.keys():
+            del self.rows[key]
+            self.stats.skipped += 1
+
+    def assign_usernames(self):
+        """
+        Given usernames are kept and their rows skipped if taken; the others
+        get ``username_base`` of the email, with the next free suffix if
+        that is taken, as sign-up does.
+        """
+        wanted = {key: _clean(row.get('username')) for key, (_, row) in self.rows.items()}
+        derived = {key: username_base(email) for key, (email, _) in self.rows.items() if not wanted[key]}
+        taken = set(
+            CustomUser.objects.filter(username__in={*wanted.values(), *derived.values()} - {''})
+            .values_list('username', flat=True)
+        )
+
+        usernames = {}
+        for key, username in wanted.items():
+            if not username:
+                continue
+            if username in taken:
+                del self.rows[key]
+                self.stats.skipped += 1
+            else:
+                usernames[key] = username
+                taken.add(username)
+
+        suffixes = {}
+        for key, base in derived.items():
+            username = base
+            if username in taken:
+                # One query per clashing base; later clashes count on from it.
+                suffix = suffixes.get(base) or next_suffix(base)
+                while f'{base}{suffix}' in taken:
+                    suffix += 1
+                suffixes[base] = suffix + 1
+                username = f'{base}{suffix}'
+            usernames[key] = username
+            taken.add(username)
+        return usernames
+
+
+def _provision_batch(rows, stats, pool, invite, active, base_url):
+    batch = _Batch(rows, stats)
+    batch.drop_existing()
+    usernames = batch.assign_usernames()
+    if not batch.rows:
+        return
+
+    keys = list(batch.rows)
+    passwords = {} if invite else {
+        key: password for key in keys
+        if isinstance(password := batch.rows[key][1].get('password'), str) and password
+    }
+    encoded = dict(zip(passwords, hash_passwords(passwords.values(), pool)))
+
+    # One timestamp for the batch tells its new rows from conflicting ones.
+    date_joined = timezone.now()
+    users = []
+    for key in keys:
+        email, row = batch.rows[key]
+        gender = _clean(row.get('gender')).lower()
+        users.append(CustomUser(
+            email=email,
+            username=usernames[key],
+            first_name=_clean(row.get('first_name'))[:150],
+            last_name=_clean(row.get('last_name'))[:150],
+            gender=gender if gender in GENDERS else None,
+            # Invitees and rows without a password set one via password reset.
+            password=encoded.get(key) or make_password(None),
+            is_active=active,
+            date_joined=date_joined,
+        ))
+
+    with transaction.atomic():
+        # Rows that lost a race with a concurrent sign-up are left out, not errors.
+        CustomUser.objects.bulk_create(users, ignore_conflicts=True)
+        created = list(
+            CustomUser.objects.alias(email_lower=Lower('email'))
+            .filter(email_lower__in=keys, date_joined=date_joined)
+            .only('pk', 'email', 'first_name', 'token_version')
+        )
+        if base_url and not active and created:
+            stats.emails_queued += enqueue_verification_emails(created, base_url)
+    stats.created += len(created)
+    stats.skipped += len(keys) - len(created)
+
+
+def provision_users(rows, batch_size=1000, workers=0, invite=False, active=False,
+                    verification_base_url=None, progress=None):
+    """
+    Creates users from ``rows``, dicts with ``email`` and optionally
+    ``username``, ``password``, ``first_name``, ``last_name`` and ``gender``.
+
+    Rows are consumed ``batch_size`` at a time, so memory doesn't grow with
+    the input. Per batch: one query each for taken emails and usernames, the
+    passwords hashed across ``workers`` processes, one ``bulk_create``
+    that skips conflicts and, with ``verification_base_url``, verification
+    emails for the new inactive users queued in bulk. ``invite`` gives every
+    user an unusable password instead. Rows with a taken email or username,
+    or repeating an earlier email in their batch, are skipped; rows that
+    aren't objects (e.g. malformed JSON lines) or lack a valid email are
+    invalid.
+
+    ``progress(stats)`` is called after each batch. Returns the
+    ``ProvisionStats``.
+    """
+    stats = ProvisionStats()
+    rows = iter(rows)
+    start = time.perf_counter()
+    with bulk_hashing_pool(workers) as pool:
+        while batch := list(islice(rows, batch_size)):
+            stats.rows += len(batch)
+            stats.batches += 1
+            _provision_batch(batch, stats, pool, invite, active, verification_base_url)
+            stats.seconds = time.perf_counter() - start
+            if progress is not None:
+                progress(stats)
+    return stats
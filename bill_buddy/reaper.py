@@ -0,0 +1,69 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .models import EmailVerificationToken, PasswordResetToken
+
+
+class PurgeResult:
+    def __init__(self, label, deleted, seconds):
+        self.label = label
+        self.deleted = deleted
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+
+def purge_in_chunks(queryset, chunk_size=1000, pause=0.0):
+    """
+    Deletes every row matched by ``queryset`` in primary-key ordered chunks.
+
+    Each chunk is one keyset lookup for its upper primary key followed by a
+    ``DELETE`` bounded by the previous and current upper keys, in its own
+    short transaction, so locks are held for at most ``chunk_size`` rows at a
+    time. ``pause`` seconds are slept between chunks to leave room for live
+    traffic.
+    Returns the number of rows deleted.
+    """
+    queryset = queryset.order_by('pk')
+    deleted = 0
+    last_pk = None
+    while True:
+        window = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        upper = list(window.values_list('pk', flat=True)[chunk_size - 1:chunk_size])
+        if upper:
+            window = window.filter(pk__lte=upper[0])
+        with transaction.atomic():
+            count, _ = window.delete()
+        deleted += count
+        if not upper:
+            return deleted
+        last_pk = upper[0]
+        if pause:
+            time.sleep(pause)
+
+
+def expired_querysets(now=None):
+    """The expired rows of every table that otherwise grows without bound."""
+    now = now or timezone.now()
+    return [
+        ('email verification tokens', EmailVerificationToken.objects.expired(now)),
+        ('password reset tokens', PasswordResetToken.objects.expired(now)),
+        # Blacklist entries go first so the outstanding tokens they point at
+        # can be removed without cascading.
+        ('blacklisted JWTs', BlacklistedToken.objects.filter(token__expires_at__lte=now)),
+        ('outstanding JWTs', OutstandingToken.objects.filter(expires_at__lte=now)),
+    ]
+
+
+def purge_expired(chunk_size=1000, pause=0.0, now=None):
+    results = []
+    for label, queryset in expired_querysets(now):
+        start = time.monotonic()
+        deleted = purge_in_chunks(queryset, chunk_size=chunk_size, pause=pause)
+        results.append(PurgeResult(label, deleted, time.monotonic() - start))
+    return results
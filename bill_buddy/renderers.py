@@ -0,0 +1,109 @@
+import json
+import math
+from functools import lru_cache
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # The stdlib encoder is used instead.
+    orjson = None
+
+# Left for the DRF encoder, whose formats differ from orjson's native ones.
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+)
+# orjson < 3.9 can't embed pre-encoded JSON, so such values fall back whole.
+_HAS_FRAGMENT = hasattr(orjson, 'Fragment')
+
+
+class Envelope(dict):
+    """
+    The ``{success, message, data, errors}`` dict built by ``custom_response``.
+
+    It behaves as a plain dict everywhere; ``FastJSONRenderer`` recognises it
+    and reuses the pre-encoded bytes for its ``success``/``message`` prefix.
+    """
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` producing the same bytes faster.
+
+    Compact, non-ASCII-escaping output is encoded with orjson when it is
+    installed. Values orjson can't encode identically (datetimes, lazy
+    strings, non-string keys, lone surrogates, ...) go through DRF's encoder,
+    and pretty-printed or ASCII-only output is left to ``JSONRenderer``.
+    orjson writes NaN and infinities as ``null``, so output containing
+    ``null`` is checked for them and re-encoded by DRF's encoder, which
+    refuses them under ``STRICT_JSON``. The one known difference is float
+    formatting in exponent notation (``1e-05`` becomes ``0.00001``), which
+    decodes to the same value.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if (isinstance(data, Envelope) and data.keys() == _ENVELOPE_KEYS
+                and type(data['success']) is bool and type(data['message']) is str):
+            body = b''.join((
+                _envelope_prefix(data['success'], data['message']),
+                self.dumps(data['data']),
+                b',"errors":',
+                self.dumps(data['errors']),
+                b'}',
+            ))
+        else:
+            body = self.dumps(data)
+        if b'\xe2\x80' in body:
+            # Fully escape U+2028 and U+2029, as JSONRenderer does.
+            body = body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return body
+
+    def dumps(self, value):
+        if not value and type(value) is dict:
+            return b'{}'
+        if orjson is not None:
+            try:
+                body = orjson.dumps(value, default=self._default, option=_ORJSON_OPTIONS)
+            except TypeError:
+                pass
+            else:
+                if b'null' not in body or not _has_nonfinite_float(value):
+                    return body
+        return _stdlib_dumps(value, self.encoder_class, self.strict)
+
+    def _default(self, value):
+        # Serialize with DRF's encoder, then hand orjson the finished JSON.
+        if not _HAS_FRAGMENT:
+            raise TypeError
+        return orjson.Fragment(_stdlib_dumps(value, self.encoder_class, self.strict))
+
+
+def _has_nonfinite_float(value):
+    if type(value) is float:
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_nonfinite_float(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_nonfinite_float(item) for item in value)
+    return False
+
+
+def _stdlib_dumps(value, encoder_class, strict):
+    return json.dumps(
+        value, cls=encoder_class, ensure_ascii=False, allow_nan=not strict, separators=(',', ':'),
+    ).encode()
+
+
+_ENVELOPE_KEYS = {'success', 'message', 'data', 'errors'}
+
+
+@lru_cache(maxsize=256)
+def _envelope_prefix(success, message):
+    """``{"success":...,"message":...,"data":`` for a (success, message) pair."""
+    return _stdlib_dumps({'success': success, 'message': message}, None, True)[:-1] + b',"data":'
@@ -1,5 +1,7 @@
 from rest_framework.response import Response
 
+from .renderers import Envelope
+
 def custom_response(success=True, message=None, data=None, errors=None, status_code=200):
     """
     Returns a consistent response format for API views.
@@ -14,10 +16,10 @@ def custom_response(success=True, message=None, data=None, errors=None, status_c
     Returns:
     - DRF Response object
     """
-    response_data = {
-        "success": success,
-        "message": message if message else ("Operation successful" if success else "Operation failed"),
-        "data": data if data is not None else {},
-        "errors": errors if errors is not None else {}
-    }
+    response_data = Envelope(
+        success=success,
+        message=message if message else ("Operation successful" if success else "Operation failed"),
+        data=data if data is not None else {},
+        errors=errors if errors is not None else {},
+    )
     return Response(response_data, status=status_code)
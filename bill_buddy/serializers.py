@@ -3,6 +3,21 @@
 from rest_framework import serializers
 from .models import CustomUser
 
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = CustomUser.PROFILE_FIELDS
+
+
+class ProfileUpdateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = CustomUser.PROFILE_FIELDS
+        # Changing the email needs its own verification flow, and access
+        # tokens carry the username as a claim until they expire.
+        read_only_fields = ('email', 'username')
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
 
@@ -11,7 +26,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('email', 'first_name', 'last_name', 'password', 'gender', 'username')
 
     def validate_email(self, value):
-        if CustomUser.objects.filter(email=value).exists():
+        if CustomUser.objects.by_email(value).exists():
             raise serializers.ValidationError("User with this email already exists.")
         return value
 
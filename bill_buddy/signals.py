@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_token_version
+from .metrics import install_query_timer
+from .profiles import forget_profile
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_token_version(sender, instance, **kwargs):
+    # After commit, so a concurrent request can't re-cache the old version.
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_token_version(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_profile(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: forget_profile(user_id))
+
+
+# Every connection counts and times the queries run for the current request.
+connection_created.connect(install_query_timer, dispatch_uid='bill_buddy.metrics.install_query_timer')
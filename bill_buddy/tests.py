@@ -1,3 +1,1389 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import runpy
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import jwt
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core import mail
+from django.contrib.auth.hashers import make_password
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from jwt.algorithms import has_crypto
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import TokenError
+
+from . import async_views, profiles
+from .authentication import ClaimsRefreshToken, ClaimsUser, StatelessJWTAuthentication
+from .benchmarks import find_regressions
+from .blacklist import BlacklistCache, BloomFilter, ExpiringLRU, reset_blacklist_cache
+from .checks import check_resend_window
+from .emails import _candidates, get_email_templates, render_email
+from .hashers import shutdown_pool, verify_password
+from .mail import MailDispatcher, get_dispatcher
+from .metrics import registry
+from .models import CustomUser, EmailVerificationToken, OutboundEmail, PasswordResetToken, hash_token
+from .outbox import drain_outbox, enqueue_email
+from .profiles import cached_profile
+from .provisioning import provision_users, read_rows
+from .reaper import purge_expired, purge_in_chunks
+from .renderers import FastJSONRenderer
+from .response import custom_response
+from .throttling import CacheWindowCounter, LocalWindowCounter, reset_throttle_store
+from .tokens import EMAIL_VERIFY, PASSWORD_RESET, TOKEN_MAX_AGE, make_signed_token
+from .usernames import create_with_unique_username, get_or_create_by_email, next_suffix
+from .utils import resend_verification_emails
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        get_dispatcher().close()
+
+    def test_register_queues_verification_email(self):
+        response = self.client.post(reverse('register'), {
+            'email': 'jane@example.com',
+            'username': 'jane',
+            'first_name': 'Jane',
+            'last_name': 'Doe',
+            'password': 'secret123',
+            'gender': 'female',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ['jane@example.com'])
+        self.assertEqual(queued.status, OutboundEmail.STATUS_PENDING)
+
+    def test_drain_sends_batch_and_marks_sent(self):
+        for i in range(3):
+            enqueue_email('Subject', 'Body', [f'user{i}@example.com'])
+
+        with mock.patch('bill_buddy.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(drain_outbox(batch_size=10), (3, 0))
+
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertEqual(drain_outbox(batch_size=10), (0, 0))
+
+    def test_drain_sends_the_batch_in_one_call(self):
+        for i in range(3):
+            enqueue_email('Subject', 'Body', [f'user{i}@example.com'])
+
+        stats = get_dispatcher().stats
+        batches, messages_sent = stats.batches, stats.messages_sent
+        drain_outbox(batch_size=10)
+
+        self.assertEqual((stats.batches - batches, stats.messages_sent - messages_sent), (1, 3))
+
+    def test_failed_batch_is_retried_message_by_message(self):
+        for recipient in ('a@example.com', 'refused@example.com', 'b@example.com'):
+            enqueue_email('Subject', 'Body', [recipient])
+        send_messages = locmem.EmailBackend.send_messages
+
+        def refuse(backend, messages):
+            if any(message.to == ['refused@example.com'] for message in messages):
+                raise OSError('refused')
+            return send_messages(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', refuse):
+            self.assertEqual(drain_outbox(batch_size=10), (2, 1))
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['a@example.com', 'b@example.com'])
+        refused = OutboundEmail.objects.get(status=OutboundEmail.STATUS_PENDING)
+        self.assertEqual((refused.to, refused.last_error), (['refused@example.com'], 'refused'))
+
+    def test_failed_send_is_retried_with_backoff(self):
+        email = enqueue_email('Subject', 'Body', ['user@example.com'])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('boom')):
+            self.assertEqual(drain_outbox(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'boom')
+        self.assertGreater(email.next_attempt_at, email.created_at)
+        # Not due again until the backoff has passed.
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        email = enqueue_email('Subject', 'Body', ['user@example.com'])
+        OutboundEmail.objects.filter(pk=email.pk).update(attempts=4)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('boom')):
+            drain_outbox()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.STATUS_FAILED)
+
+
+class MailDispatcherTests(TestCase):
+    def setUp(self):
+        get_dispatcher().close()
+
+    def test_reuses_one_connection_across_batches(self):
+        with MailDispatcher() as dispatcher:
+            for batch in range(3):
+                messages = [EmailMessage('Hi', 'Body', None, [f'{batch}-{i}@example.com']) for i in range(5)]
+                self.assertEqual(dispatcher.send_messages(messages), 5)
+
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertEqual(dispatcher.stats.connection_opens, 1)
+        self.assertEqual(dispatcher.stats.batches, 3)
+        self.assertEqual(dispatcher.stats.messages_sent, 15)
+
+    def test_reopens_after_idle_timeout_and_errors(self):
+        dispatcher = MailDispatcher(idle_timeout=0)
+        dispatcher.send_messages([EmailMessage('Hi', 'Body', None, ['a@example.com'])])
+        dispatcher.send_messages([EmailMessage('Hi', 'Body', None, ['b@example.com'])])
+        self.assertEqual(dispatcher.stats.connection_opens, 2)
+
+        dispatcher = MailDispatcher()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            with self.assertRaises(OSError):
+                dispatcher.send_messages([EmailMessage('Hi', 'Body', None, ['a@example.com'])])
+        dispatcher.send_messages([EmailMessage('Hi', 'Body', None, ['a@example.com'])])
+        self.assertEqual(dispatcher.stats.connection_opens, 2)
+
+    def test_bulk_resend_queues_recent_inactive_users(self):
+        for i in range(5):
+            CustomUser.objects.create_user(f'new{i}@example.com', 'secret123', username=f'new{i}')
+        CustomUser.objects.create_user('active@example.com', 'secret123', username='active', is_active=True)
+        CustomUser.objects.create_user(
+            'old@example.com', 'secret123', username='old',
+            date_joined=timezone.now() - timedelta(days=3),
+        )
+        # Joined before date_joined was recorded.
+        CustomUser.objects.create_user('legacy@example.com', 'secret123', username='legacy', date_joined=None)
+
+        queued = resend_verification_emails('https://bill.example', hours=24, chunk_size=2)
+
+        self.assertEqual(queued, 5)
+        self.assertEqual(mail.outbox, [])
+        emails = OutboundEmail.objects.order_by('pk')
+        self.assertEqual([email.to for email in emails], [[f'new{i}@example.com'] for i in range(5)])
+        self.assertIn('https://bill.example/api/email-verify/?token=', emails[0].body)
+        self.assertEqual(EmailVerificationToken.objects.count(), 5)
+
+
+class EmailTemplateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_renders_text_and_escaped_html(self):
+        subject, text, html = render_email('verification', {
+            'first_name': '<Jo>{x}',
+            'url': 'https://bill.example/api/email-verify/?token=a&b',
+        })
+
+        self.assertEqual(subject, 'Verify Your Email - Bill Buddy')
+        self.assertIn('Hi <Jo>{x},', text)
+        self.assertIn('https://bill.example/api/email-verify/?token=a&b', text)
+        self.assertIn('Hi &lt;Jo&gt;{x},', html)
+        self.assertIn('href="https://bill.example/api/email-verify/?token=a&amp;b"', html)
+
+    def test_templates_are_compiled_once_per_language(self):
+        get_email_templates.cache_clear()
+        for _ in range(3):
+            render_email('password_reset', {'first_name': 'Jo', 'url': 'u'}, 'pt-br')
+        self.assertEqual(get_email_templates.cache_info().misses, 1)
+        self.assertEqual(_candidates('x.txt', 'pt-BR'), [
+            'bill_buddy/emails/pt-br/x.txt',
+            'bill_buddy/emails/pt/x.txt',
+            'bill_buddy/emails/x.txt',
+        ])
+
+    def test_reset_email_is_queued_with_html_alternative(self):
+        CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', first_name='Jane')
+
+        self.client.post(reverse('password-reset'), {'email': 'jane@example.com'})
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.subject, 'Reset Your Password - Bill Buddy')
+        self.assertIn('Hi Jane,', queued.body)
+        self.assertIn('http://testserver/api/password-reset-confirm/?token=', queued.body)
+        self.assertIn('<a href="http://testserver/api/password-reset-confirm/?token=', queued.html_body)
+
+
+@override_settings(AUTH_TOKEN_MODE='signed')
+class SignedTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane')
+
+    def test_send_does_not_store_token_rows(self):
+        self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+
+        self.assertFalse(EmailVerificationToken.objects.exists())
+        self.assertIn('/api/email-verify/?token=', OutboundEmail.objects.get().body)
+
+    def test_verify_is_a_single_write_and_single_use(self):
+        token = make_signed_token(self.user, EMAIL_VERIFY)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('email-verify'), {'token': token})
+        self.assertTrue(response.json()['success'])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+        response = self.client.get(reverse('email-verify'), {'token': token})
+        self.assertEqual(response.json()['message'], 'Token already used.')
+
+    def test_reset_token_is_bound_to_its_purpose(self):
+        token = make_signed_token(self.user, EMAIL_VERIFY)
+        response = self.client.post(reverse('password-reset-confirm'), {'token': token, 'new_password': 'newpass123'})
+        self.assertEqual(response.json()['message'], 'Invalid token')
+
+        token = make_signed_token(self.user, PASSWORD_RESET)
+        response = self.client.post(reverse('password-reset-confirm'), {'token': token, 'new_password': 'newpass123'})
+        self.assertTrue(response.json()['success'])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass123'))
+
+        response = self.client.post(reverse('password-reset-confirm'), {'token': token, 'new_password': 'other123'})
+        self.assertEqual(response.json()['message'], 'Invalid token')
+
+    def test_reset_voids_other_outstanding_links(self):
+        first = make_signed_token(self.user, PASSWORD_RESET)
+        second = make_signed_token(self.user, PASSWORD_RESET)
+
+        response = self.client.post(reverse('password-reset-confirm'), {'token': first, 'new_password': 'newpass123'})
+        self.assertTrue(response.json()['success'])
+
+        # Rejected by its token version, even with a fresh nonce cache.
+        cache.clear()
+        response = self.client.post(reverse('password-reset-confirm'), {'token': second, 'new_password': 'other123'})
+        self.assertEqual(response.json()['message'], 'Invalid token')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass123'))
+
+
+class HashedTokenStorageTests(TestCase):
+    def test_verification_token_is_stored_as_digest(self):
+        user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane')
+        self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+        body = OutboundEmail.objects.get().body
+        token = body.split('?token=')[1].split()[0]
+
+        stored = EmailVerificationToken.objects.get(user=user)
+        self.assertEqual(bytes(stored.token_hash), hash_token(token))
+        self.assertEqual(len(stored.token_hash), 32)
+
+        response = self.client.get(reverse('email-verify'), {'token': token})
+        self.assertTrue(response.json()['success'])
+        stored.refresh_from_db()
+        self.assertTrue(stored.used)
+
+        response = self.client.get(reverse('email-verify'), {'token': token + 'x'})
+        self.assertEqual(response.json()['message'], 'Invalid token.')
+
+
+class ReaperTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane')
+
+    def _tokens(self, count, age):
+        tokens = EmailVerificationToken.objects.bulk_create(
+            EmailVerificationToken(user=self.user, token_hash=hash_token(f'{age}-{i}')) for i in range(count)
+        )
+        EmailVerificationToken.objects.filter(pk__in=[t.pk for t in tokens]).update(
+            created_at=timezone.now() - age,
+        )
+
+    def test_purges_only_expired_rows_in_chunks(self):
+        self._tokens(7, timedelta(hours=1))
+        self._tokens(2, timedelta(seconds=10))
+
+        # Per chunk: keyset lookup + DELETE, each wrapped in a savepoint inside TestCase.
+        with self.assertNumQueries(3 * 4):
+            deleted = purge_in_chunks(EmailVerificationToken.objects.expired(), chunk_size=3)
+
+        self.assertEqual(deleted, 7)
+        self.assertEqual(EmailVerificationToken.objects.count(), 2)
+
+    def test_purge_expired_covers_jwt_blacklist(self):
+        self._tokens(2, timedelta(hours=1))
+        PasswordResetToken.objects.create(user=self.user, token_hash=hash_token('fresh'))
+        expired = OutstandingToken.objects.create(
+            user=self.user, jti='old', token='x', expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        BlacklistedToken.objects.create(token=expired)
+        OutstandingToken.objects.create(
+            user=self.user, jti='new', token='y', expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        results = {result.label: result.deleted for result in purge_expired(chunk_size=1)}
+
+        self.assertEqual(results, {
+            'email verification tokens': 2,
+            'password reset tokens': 0,
+            'blacklisted JWTs': 1,
+            'outstanding JWTs': 1,
+        })
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['new'])
+        self.assertEqual(PasswordResetToken.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'bill_buddy.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(
+            email='jane@example.com', username='jane', is_active=True,
+            password=make_password('secret123', hasher='md5'),
+        )
+
+    def test_login_rehashes_with_preferred_hasher(self):
+        response = self.client.post(reverse('login'), {'email': 'jane@example.com', 'password': 'secret123'})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password('secret123'))
+
+    def test_wrong_password_is_not_rehashed(self):
+        self.assertFalse(verify_password(self.user, 'wrong'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_verifies_and_rehashes_in_process_pool(self):
+        self.addCleanup(shutdown_pool)
+
+        self.assertFalse(verify_password(self.user, 'wrong'))
+        self.assertTrue(verify_password(self.user, 'secret123'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.user = CustomUser.objects.create_user(
+            'jane@example.com', 'secret123', username='jane',
+            first_name='Jane', last_name='Doe', gender='female', is_active=True,
+        )
+
+    def login(self, email, password):
+        return self.client.post(reverse('login'), {'email': email, 'password': password})
+
+    def test_success_fetches_user_once(self):
+        # One narrow user SELECT plus the OutstandingToken INSERT.
+        with self.assertNumQueries(2):
+            response = self.login('jane@example.com', 'secret123')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['user'], {
+            'username': 'jane',
+            'email': 'jane@example.com',
+            'first_name': 'Jane',
+            'last_name': 'Doe',
+            'gender': 'female',
+        })
+
+    def test_unknown_email_costs_a_hash(self):
+        with mock.patch('bill_buddy.backends.run_dummy_hash') as dummy_hash:
+            with self.assertNumQueries(1):
+                response = self.login('nobody@example.com', 'secret123')
+
+        self.assertEqual(response.status_code, 401)
+        dummy_hash.assert_called_once_with('secret123')
+
+    def test_passwordless_accounts_cost_a_hash(self):
+        for email, password in (('social@example.com', ''), ('invited@example.com', make_password(None))):
+            CustomUser.objects.create(email=email, username=email.split('@')[0], password=password, is_active=True)
+            with self.subTest(email=email), mock.patch('bill_buddy.hashers.run_dummy_hash') as dummy_hash:
+                response = self.login(email, 'secret123')
+
+                self.assertEqual(response.status_code, 401)
+                dummy_hash.assert_called_once_with('secret123')
+
+    def test_wrong_password_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.login('jane@example.com', 'wrong')
+        self.assertEqual(response.json()['message'], 'Invalid credentials')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CaseInsensitiveEmailTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('Jane.Doe@example.com', 'secret123', username='jane', is_active=True)
+
+    def test_lookup_ignores_case(self):
+        self.assertEqual(CustomUser.objects.by_email('jane.doe@EXAMPLE.com').get(), self.user)
+
+        response = self.client.post(reverse('login'), {'email': 'JANE.DOE@example.com', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('password-reset'), {'email': 'jane.doe@example.com'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_email_is_unique_regardless_of_case(self):
+        response = self.client.post(reverse('register'), {
+            'email': 'JANE.DOE@example.com', 'username': 'jane2', 'first_name': 'J', 'last_name': 'D',
+            'password': 'secret123', 'gender': 'female',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['errors'])
+
+        with self.assertRaises(IntegrityError):
+            CustomUser.objects.create(email='jane.doe@example.com', username='jane3')
+
+
+class UsernameAllocationTests(TestCase):
+    def test_next_suffix_is_one_query(self):
+        for username in ('john', 'john1', 'john7', 'johnny', 'john-2', 'johnny12'):
+            CustomUser.objects.create(email=f'{username}@example.com', username=username)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(next_suffix('john'), 8)
+        self.assertEqual(next_suffix('mary'), 1)
+
+    def test_social_login_allocates_next_free_username(self):
+        CustomUser.objects.create(email='john@one.example.com', username='john')
+        CustomUser.objects.create(email='john@two.example.com', username='john4')
+
+        response = self.client.post(reverse('social-login'), {'email': 'john@three.example.com'})
+
+        self.assertEqual(response.json()['data']['user']['username'], 'john5')
+
+    def test_retries_when_username_is_taken_concurrently(self):
+        CustomUser.objects.create(email='john@one.example.com', username='john')
+        real_next_suffix = next_suffix
+
+        def racing_next_suffix(base):
+            # Another request grabs the suffix between our lookup and insert.
+            suffix = real_next_suffix(base)
+            if suffix == 1:
+                CustomUser.objects.create(email='john@racer.example.com', username='john1')
+            return suffix
+
+        with mock.patch('bill_buddy.usernames.next_suffix', side_effect=racing_next_suffix):
+            user = create_with_unique_username('john', email='john@two.example.com')
+
+        self.assertEqual(user.username, 'john2')
+
+    def test_other_conflicts_are_not_retried(self):
+        CustomUser.objects.create(email='john@example.com', username='john')
+
+        with self.assertRaises(IntegrityError):
+            create_with_unique_username('someone', email='JOHN@example.com')
+
+    def test_returning_social_user_is_one_query(self):
+        user = CustomUser.objects.create(email='john@example.com', username='john')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_or_create_by_email('JOHN@example.com'), (user, False))
+
+    def test_get_or_create_fetches_user_created_concurrently(self):
+        real_create = create_with_unique_username
+
+        def racing_create(base, **fields):
+            # Another request creates the account between our fetch and insert.
+            real_create('racer', email=fields['email'])
+            return real_create(base, **fields)
+
+        with mock.patch('bill_buddy.usernames.create_with_unique_username', side_effect=racing_create):
+            user, created = get_or_create_by_email('john@example.com', is_active=True)
+
+        self.assertFalse(created)
+        self.assertEqual(user.username, 'racer')
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            'jane@example.com', 'secret123', username='jane', is_active=True,
+        )
+        self.refresh = ClaimsRefreshToken.for_user(self.user)
+
+    def authenticate(self, token=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token or self.refresh.access_token}')
+        return StatelessJWTAuthentication().authenticate(request)[0]
+
+    def test_user_is_built_from_claims(self):
+        self.authenticate()  # caches the token version
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.id, user.username, user.email), (self.user.pk, 'jane', 'jane@example.com'))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.instance, self.user)
+
+    def test_password_reset_revokes_tokens(self):
+        self.authenticate()
+        PasswordResetToken.objects.create(user=self.user, token_hash=hash_token('reset-token'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('password-reset-confirm'), {
+                'token': 'reset-token', 'new_password': 'n3w-Secret!',
+            })
+        self.assertTrue(response.json()['success'])
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has been revoked'):
+            self.authenticate()
+        self.user.refresh_from_db()
+        self.assertIsInstance(self.authenticate(ClaimsRefreshToken.for_user(self.user).access_token), ClaimsUser)
+
+    def test_deactivation_revokes_tokens(self):
+        self.authenticate()
+        user = CustomUser.objects.get(pk=self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.is_active = False
+            user.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Token has been revoked'):
+            self.authenticate()
+
+    def test_profile_edits_keep_tokens(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.first_name = 'Janet'
+        user.save()
+
+        self.assertEqual(self.authenticate().id, self.user.pk)
+
+
+class BlacklistCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_blacklist_cache()
+        self.addCleanup(reset_blacklist_cache)
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', is_active=True)
+
+    def logout(self, refresh):
+        return self.client.post(
+            reverse('logout'), {'refresh': str(refresh)},
+            HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}',
+        )
+
+    def test_blacklisted_token_is_rejected_from_memory(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.assertEqual(self.logout(refresh).status_code, 200)
+
+        with self.assertNumQueries(0):
+            with self.assertRaisesMessage(TokenError, 'Token is blacklisted'):
+                ClaimsRefreshToken(str(refresh))
+
+    @override_settings(JWT_BLACKLIST_CACHE='default')
+    def test_bloom_filter_answers_negative_lookups(self):
+        kept = ClaimsRefreshToken.for_user(self.user)
+        revoked = ClaimsRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoked.blacklist()
+
+        other_process = BlacklistCache()
+        with self.assertNumQueries(2):  # sizes and fills the Bloom filter
+            self.assertFalse(other_process.is_blacklisted(kept['jti'], kept['exp']))
+        with self.assertNumQueries(0):
+            self.assertFalse(other_process.is_blacklisted(kept['jti'], kept['exp']))
+            self.assertTrue(other_process.is_blacklisted(revoked['jti'], revoked['exp']))
+
+        # A logout elsewhere moves the generation on; the filter catches up.
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.blacklist()
+        cache.delete(f"bill_buddy:blacklist:{kept['jti']}")
+        self.assertTrue(other_process.is_blacklisted(kept['jti'], kept['exp']))
+
+    def test_lru_is_bounded_and_expires_entries(self):
+        lru = ExpiringLRU(maxsize=2)
+        lru.add('a', time.time() + 60)
+        lru.add('b', time.time() - 1)
+        lru.add('c', time.time() + 60)
+
+        self.assertNotIn('a', lru)
+        self.assertNotIn('b', lru)
+        self.assertIn('c', lru)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f'jti-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+
+def _private_key_pem(kind):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+    key = rsa.generate_private_key(65537, 2048) if kind == 'rsa' else ed25519.Ed25519PrivateKey.generate()
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    ).decode()
+
+
+@skipUnless(has_crypto, "needs the cryptography package")
+class KeyRingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rsa_pem = _private_key_pem('rsa')
+        cls.ed25519_pem = _private_key_pem('ed25519')
+        cls.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', is_active=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tokens_verify_against_published_jwks(self):
+        with override_settings(JWT_PRIVATE_KEYS=[self.ed25519_pem]):
+            access = str(ClaimsRefreshToken.for_user(self.user).access_token)
+            jwks = self.client.get(reverse('jwks')).json()
+
+        header = jwt.get_unverified_header(access)
+        self.assertEqual((header['alg'], header['kid']), ('EdDSA', jwks['keys'][0]['kid']))
+        public_key = jwt.PyJWK(jwks['keys'][0]).key
+        self.assertEqual(jwt.decode(access, public_key, algorithms=['EdDSA'])['username'], 'jane')
+
+    def test_rotated_out_key_still_verifies(self):
+        with override_settings(JWT_PRIVATE_KEYS=[self.rsa_pem]):
+            old = str(ClaimsRefreshToken.for_user(self.user))
+        with override_settings(JWT_PRIVATE_KEYS=[self.ed25519_pem, self.rsa_pem]):
+            self.assertEqual(ClaimsRefreshToken(old)['username'], 'jane')
+            self.assertEqual(jwt.get_unverified_header(str(ClaimsRefreshToken.for_user(self.user)))['alg'], 'EdDSA')
+        with override_settings(JWT_PRIVATE_KEYS=[self.ed25519_pem]):
+            with self.assertRaises(TokenError):
+                ClaimsRefreshToken(old)
+
+    def test_jwks_is_cacheable(self):
+        with override_settings(JWT_PRIVATE_KEYS=[self.rsa_pem, self.ed25519_pem]):
+            response = self.client.get(reverse('jwks'))
+            etag = response['ETag']
+            self.assertEqual([key['alg'] for key in response.json()['keys']], ['RS256', 'EdDSA'])
+            self.assertIn('max-age=', response['Cache-Control'])
+
+            response = self.client.get(reverse('jwks'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+            for header, status_code in (
+                (f'"other", W/{etag}', 304),
+                ('*', 304),
+                (f'"x{etag[1:-1]}x"', 200),
+                (etag[1:-1], 200),
+            ):
+                with self.subTest(header=header):
+                    response = self.client.get(reverse('jwks'), HTTP_IF_NONE_MATCH=header)
+                    self.assertEqual(response.status_code, status_code)
+
+    def test_without_keys_tokens_use_hs256(self):
+        self.assertEqual(jwt.get_unverified_header(str(ClaimsRefreshToken.for_user(self.user)))['alg'], 'HS256')
+        self.assertEqual(self.client.get(reverse('jwks')).json(), {'keys': []})
+
+
+class FastJSONRendererTests(TestCase):
+    payloads = [
+        custom_response(success=False, message="Invalid credentials", status_code=401).data,
+        custom_response(data={'user': {'username': 'jöhn', 'first_name': '名前', 'gender': None}}).data,
+        custom_response(success=False, errors={'email': [ErrorDetail('Enter a valid email.', code='invalid')]}).data,
+        {'line separators': 'a\u2028b\u2029c', 'control': '\x00\x1f"\\', 'emoji': '\U0001F600'},
+        {'when': timezone.now(), 'lazy': gettext_lazy('Email is required'), 'ids': [1, 2 ** 70, -3]},
+        {1: 'int key', 'nested': [[], {}, True, False, None, 0.5]},
+    ]
+
+    def assertSameBytes(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_output_matches_json_renderer(self):
+        self.assertSameBytes()
+
+    def test_stdlib_fallback_matches_json_renderer(self):
+        with mock.patch('bill_buddy.renderers.orjson', None):
+            self.assertSameBytes()
+
+    def test_non_finite_floats_are_refused_like_json_renderer(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            payload = custom_response(data={'ratio': [value, None]}).data
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render(payload)
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render(payload)
+
+    def test_indented_output_matches_json_renderer(self):
+        payload = self.payloads[1]
+        self.assertEqual(
+            FastJSONRenderer().render(payload, 'application/json; indent=2'),
+            JSONRenderer().render(payload, 'application/json; indent=2'),
+        )
+
+    def test_view_responses_match_json_renderer(self):
+        response = self.client.post(reverse('login'), {'email': 'nobody@example.com', 'password': 'x'})
+
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', is_active=True)
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        return {
+            line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in response.content.decode().splitlines() if not line.startswith('#')
+        }
+
+    def test_records_queries_and_hash_time_per_view(self):
+        self.client.post(reverse('login'), {'email': 'jane@example.com', 'password': 'secret123'})
+
+        metrics = self.scrape()
+        labels = '{view="login",method="POST"}'
+        self.assertEqual(metrics[f'bill_buddy_request_duration_seconds_count{labels}'], 1)
+        self.assertEqual(metrics[f'bill_buddy_request_duration_seconds_bucket{{view="login",method="POST",le="+Inf"}}'], 1)
+        self.assertGreater(metrics[f'bill_buddy_db_queries_total{labels}'], 0)
+        self.assertGreater(metrics[f'bill_buddy_password_hash_seconds_total{labels}'], 0)
+        self.assertEqual(metrics[f'bill_buddy_email_send_seconds_total{labels}'], 0)
+
+    def test_records_email_time(self):
+        self.client.post(reverse('password-reset'), {'email': 'jane@example.com'})
+
+        metrics = self.scrape()
+        self.assertGreater(metrics['bill_buddy_email_send_seconds_total{view="password-reset",method="POST"}'], 0)
+
+    def test_unknown_methods_share_one_series(self):
+        for method in ('FOO', 'BAR', 'BAZ'):
+            self.client.generic(method, reverse('jwks'))
+
+        metrics = self.scrape()
+        self.assertEqual(metrics['bill_buddy_request_duration_seconds_count{view="jwks",method="other"}'], 3)
+        self.assertEqual([key for key in metrics if key.startswith('bill_buddy_db_queries_total')],
+                         ['bill_buddy_db_queries_total{view="jwks",method="other"}'])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('jwks'))
+
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="0 queries", hash;dur=')
+
+    def test_no_server_timing_header_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('jwks')))
+
+    def test_endpoint_is_internal(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_forwarded_requests_need_num_proxies(self):
+        # A same-host proxy connects from 127.0.0.1 on the public client's behalf.
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            public = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+            internal = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='127.0.0.1')
+
+        self.assertEqual(public.status_code, 403)
+        self.assertEqual(internal.status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BrowserMiddlewareTests(TestCase):
+    def setUp(self):
+        CustomUser.objects.create_superuser('admin@example.com', 'secret123', username='admin', is_active=True)
+        self.client = Client(enforce_csrf_checks=True)
+
+    def admin_login(self, with_csrf_token):
+        page = self.client.get(reverse('admin:login'))
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(page['X-Frame-Options'], 'DENY')
+        data = {'username': 'admin@example.com', 'password': 'secret123', 'next': reverse('admin:index')}
+        if with_csrf_token:
+            data['csrfmiddlewaretoken'] = self.client.cookies['csrftoken'].value
+        return self.client.post(reverse('admin:login'), data)
+
+    def test_admin_login(self):
+        response = self.admin_login(with_csrf_token=True)
+
+        self.assertRedirects(response, reverse('admin:index'))
+        self.assertEqual(self.client.get(reverse('admin:index')).status_code, 200)
+
+    def test_admin_enforces_csrf(self):
+        self.assertEqual(self.admin_login(with_csrf_token=False).status_code, 403)
+
+    def test_api_skips_browser_middleware(self):
+        self.client.cookies['sessionid'] = 'stale'
+        response = self.client.post(reverse('login'), {'email': 'admin@example.com', 'password': 'secret123'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(response.cookies)
+
+    async def test_admin_under_asgi(self):
+        response = await self.async_client.get(reverse('admin:login'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertEqual((await self.async_client.get(reverse('jwks'))).get('X-Frame-Options'), None)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class MeViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.user = CustomUser.objects.create_user(
+            'jane@example.com', 'secret123', username='jane', first_name='Jane', is_active=True,
+        )
+        self.headers = {'Authorization': f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}'}
+
+    def me(self, method='get', data=None, **headers):
+        return getattr(self.client, method)(
+            reverse('me'), data, content_type='application/json', headers={**self.headers, **headers},
+        )
+
+    def test_revalidation_skips_the_database(self):
+        response = self.me()
+        etag = response['ETag']
+        self.assertEqual(response.json()['data']['first_name'], 'Jane')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        with self.assertNumQueries(0):
+            response = self.me(**{'If-None-Match': f'"other", {etag}'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.me(**{'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_saving_the_user_changes_the_etag(self):
+        etag = self.me()['ETag']
+        self.user.first_name = 'Janet'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['first_name'])
+
+        response = self.me(**{'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['first_name'], 'Janet')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_patch_updates_profile_but_not_email(self):
+        etag = self.me()['ETag']
+
+        response = self.me('patch', {'last_name': 'Doe', 'email': 'other@example.com'}, **{'If-Match': etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['last_name'], 'Doe')
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.last_name, self.user.email), ('Doe', 'jane@example.com'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.me(**{'If-None-Match': response['ETag']}).status_code, 304)
+
+    def test_patch_rejects_stale_etag_and_ignores_username(self):
+        stale = self.me('patch', {'last_name': 'Doe'}, **{'If-Match': '"stale"'})
+        renamed = self.me('patch', {'username': 'john'})
+
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(renamed.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.username, 'jane')
+
+    def test_cold_read_racing_an_update_is_not_served(self):
+        serialize = profiles._serialize
+        raced = []
+
+        def update_then_serialize(user):
+            # The PATCH commits between the cold read's query and its cache write.
+            if not raced:
+                raced.append(True)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.me('patch', {'first_name': 'Janet'})
+            return serialize(user)
+
+        with mock.patch('bill_buddy.profiles._serialize', side_effect=update_then_serialize):
+            self.assertEqual(cached_profile(self.user.pk)[0]['first_name'], 'Jane')
+
+        self.assertEqual(self.me().json()['data']['first_name'], 'Janet')
+
+    def test_login_caches_the_profile(self):
+        response = self.client.post(reverse('login'), {'email': 'jane@example.com', 'password': 'secret123'})
+
+        with self.assertNumQueries(0):
+            data, etag = cached_profile(self.user.pk)
+        self.assertEqual(response.json()['data']['user'], data)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get(reverse('me')).status_code, 401)
+
+
+class UserExportTests(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', is_active=True, is_staff=True,
+        )
+        self.jane = CustomUser.objects.create(email='jane@example.com', username='jane', gender='female')
+        EmailVerificationToken.objects.create(user=self.jane, token_hash=hash_token('verify'))
+        self.john = CustomUser.objects.create(email='john@example.com', username='john', is_active=True)
+        ClaimsRefreshToken.for_user(self.john)
+        ClaimsRefreshToken.for_user(self.john).blacklist()
+        self.headers = {'Authorization': f'Bearer {ClaimsRefreshToken.for_user(self.staff).access_token}'}
+
+    def export(self, export_format, **kwargs):
+        return self.client.get(reverse('user-export', args=[export_format]), headers=kwargs.pop('headers', self.headers), **kwargs)
+
+    @override_settings(USER_EXPORT_CHUNK_SIZE=2)
+    def test_csv_pages_by_primary_key(self):
+        response = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        # Two full pages and the empty one that ends the export.
+        with self.assertNumQueries(3):
+            rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual([row['username'] for row in rows], ['staff', 'jane', 'john'])
+        jane, john = rows[1], rows[2]
+        self.assertEqual(
+            (jane['gender'], jane['is_active'], jane['pending_email_verification'], jane['active_refresh_token']),
+            ('female', 'False', 'True', 'False'),
+        )
+        self.assertEqual((john['gender'], john['active_refresh_token']), ('', 'True'))
+
+    def test_ndjson(self):
+        response = self.export('ndjson', HTTP_ACCEPT='application/x-ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(rows[1]['email'], 'jane@example.com')
+        self.assertIs(rows[1]['pending_password_reset'], False)
+        self.assertEqual(rows[1]['date_joined'], self.jane.date_joined.isoformat().replace('+00:00', 'Z'))
+
+    def test_demoted_staff_is_refused(self):
+        CustomUser.objects.filter(pk=self.staff.pk).update(is_staff=False)
+
+        self.assertEqual(self.export('csv').status_code, 403)
+
+    def test_csv_escapes_formulas(self):
+        CustomUser.objects.filter(pk=self.jane.pk).update(first_name='=HYPERLINK("x")', last_name='-1')
+
+        rows = list(csv.DictReader(io.StringIO(b''.join(self.export('csv').streaming_content).decode())))
+
+        self.assertEqual((rows[1]['first_name'], rows[1]['last_name']), ('\'=HYPERLINK("x")', "'-1"))
+
+    def test_staff_only(self):
+        user_headers = {'Authorization': f'Bearer {ClaimsRefreshToken.for_user(self.john).access_token}'}
+
+        self.assertEqual(self.export('csv', headers={}).status_code, 401)
+        self.assertEqual(self.export('csv', headers=user_headers).status_code, 403)
+        self.assertEqual(self.client.get('/api/internal/users/export.xml', headers=self.headers).status_code, 404)
+
+    async def test_streams_under_asgi(self):
+        response = await self.async_client.get(reverse('user-export', args=['ndjson']), headers=self.headers)
+
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(len(lines), 3)
+
+
+class ResendDeduplicationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane')
+
+    def test_repeated_resends_reuse_the_first_email(self):
+        for _ in range(3):
+            response = self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+            self.assertEqual(response.status_code, 200)
+
+        token = EmailVerificationToken.objects.get(user=self.user)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        with self.assertNumQueries(1):  # The user lookup only.
+            self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+        self.assertEqual(EmailVerificationToken.objects.get(user=self.user).token_hash, token.token_hash)
+
+    def test_purposes_are_separate_and_windows_expire(self):
+        self.client.post(reverse('password-reset'), {'email': 'jane@example.com'})
+        self.client.post(reverse('resend-password-reset'), {'email': 'jane@example.com'})
+        self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+        cache.clear()
+        self.client.post(reverse('resend-password-reset'), {'email': 'jane@example.com'})
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+    @override_settings(EMAIL_RESEND_WINDOW=0)
+    def test_window_can_be_disabled(self):
+        for _ in range(2):
+            self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_window_must_be_shorter_than_token_lifetime(self):
+        self.assertEqual(check_resend_window(None), [])
+        with override_settings(EMAIL_RESEND_WINDOW=TOKEN_MAX_AGE):
+            self.assertEqual([error.id for error in check_resend_window(None)], ['bill_buddy.E001'])
+
+    def test_failed_send_can_be_retried(self):
+        with mock.patch('bill_buddy.utils.enqueue_email', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+
+        self.client.post(reverse('resend-verification'), {'email': 'jane@example.com'})
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    async def test_async_views(self):
+        view = async_views.ResendPasswordResetEmailView.as_view()
+        for _ in range(2):
+            request = AsyncRequestFactory().post(
+                '/', {'email': 'jane@example.com'}, content_type='application/json',
+            )
+            response = await view(request)
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(await OutboundEmail.objects.acount(), 1)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', is_active=True)
+
+    def assert_sliding_window(self, counter):
+        self.assertEqual(counter.hit('k', 2, 60, now=120.0), 0)
+        self.assertEqual(counter.hit('k', 2, 60, now=150.0), 0)
+        # Until half of this window has slid out, once it is the previous one.
+        self.assertAlmostEqual(counter.hit('k', 2, 60, now=170.0), 40.0)
+        # Half of the previous window still counts: 2 * 0.5 + 0.
+        self.assertEqual(counter.hit('k', 2, 60, now=210.0), 0)
+        self.assertAlmostEqual(counter.hit('k', 2, 60, now=210.0), 30.0)
+        self.assertEqual(counter.hit('k', 2, 60, now=240.0), 0)
+        self.assertEqual(counter.hit('other', 2, 60, now=240.0), 0)
+
+    def test_local_counter(self):
+        counter = LocalWindowCounter(maxsize=2)
+        self.assert_sliding_window(counter)
+
+        counter.hit('third', 2, 60, now=240.0)
+        self.assertEqual(len(counter), 2)
+
+    def test_cache_counter(self):
+        self.assert_sliding_window(CacheWindowCounter('default'))
+
+    @throttle_rates(login_ip='100/min', login_email='2/min')
+    def test_login_is_throttled_per_email_before_hashing(self):
+        with mock.patch('bill_buddy.backends.verify_password', return_value=False) as verify:
+            for _ in range(2):
+                self.client.post(reverse('login'), {'email': 'jane@example.com', 'password': 'wrong'})
+            response = self.client.post(reverse('login'), {'email': 'JANE@example.com', 'password': 'secret123'})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(verify.call_count, 2)
+        other = self.client.post(reverse('login'), {'email': 'nobody@example.com', 'password': 'x'})
+        self.assertEqual(other.status_code, 401)
+
+    @throttle_rates(password_reset_ip='1/min', password_reset_email='10/min')
+    def test_password_reset_is_throttled_per_ip_before_email(self):
+        self.client.post(reverse('password-reset'), {'email': 'jane@example.com'})
+        response = self.client.post(reverse('password-reset'), {'email': 'jane@example.com'})
+        elsewhere = self.client.post(reverse('password-reset'), {'email': 'jane@example.com'}, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(elsewhere.status_code, 200)
+        # The request from elsewhere is accepted but deduplicated.
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    @throttle_rates(resend_verification_ip='100/min', resend_verification_email='1/min')
+    @override_settings(AUTH_THROTTLE_CACHE='default')
+    def test_shared_store(self):
+        reset_throttle_store()
+        self.client.post(reverse('resend-verification'), {'email': 'nobody@example.com'})
+        response = self.client.post(reverse('resend-verification'), {'email': 'nobody@example.com'})
+
+        self.assertEqual(response.status_code, 429)
+
+    async def test_cache_counter_async(self):
+        counter = CacheWindowCounter('default')
+
+        self.assertEqual(await counter.ahit('k', 1, 60, now=120.0), 0)
+        self.assertAlmostEqual(await counter.ahit('k', 1, 60, now=150.0), 90.0)
+        self.assertEqual(counter.hit('k', 1, 60, now=150.0), 90.0)
+
+    def test_zero_rate_closes_endpoint(self):
+        self.assertEqual(LocalWindowCounter(10).hit('k', 0, 60, now=120.0), 60.0)
+        self.assertEqual(CacheWindowCounter('default').hit('k', 0, 60, now=120.0), 60.0)
+
+    @throttle_rates(login_ip='1/min')
+    @override_settings(
+        AUTH_THROTTLE_CACHE='throttle',
+        CACHES={**settings.CACHES, 'throttle': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'throttle_cache',
+        }},
+    )
+    async def test_async_views_await_a_database_cache(self):
+        await sync_to_async(call_command)('createcachetable', 'throttle_cache', verbosity=0)
+        reset_throttle_store()
+        view = async_views.LoginView.as_view()
+
+        statuses = []
+        for _ in range(2):
+            request = AsyncRequestFactory().post(
+                '/', {'email': 'x@example.com', 'password': 'x'}, content_type='application/json',
+            )
+            statuses.append((await view(request)).status_code)
+
+        self.assertEqual(statuses, [401, 429])
+        reset_throttle_store()
+
+    @throttle_rates(login_ip='1/min')
+    async def test_async_login(self):
+        request = AsyncRequestFactory().post(
+            '/', {'email': 'x@example.com', 'password': 'x'}, content_type='application/json',
+        )
+        await async_views.LoginView.as_view()(request)
+        response = await async_views.LoginView.as_view()(request)
+
+        self.assertEqual(response.status_code, 429)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisioningTests(TestCase):
+    def test_csv_rows_are_created_and_conflicts_skipped(self):
+        CustomUser.objects.create(email='Taken@example.com', username='taken')
+        CustomUser.objects.create(email='john@old.example.com', username='john')
+        rows = read_rows(io.StringIO(
+            'email,username,password,first_name,gender\n'
+            'jane@example.com,jane,secret123,Jane,Female\n'
+            'TAKEN@example.com,,,,\n'
+            'JANE@example.com,jane2,,,\n'
+            'someone@example.com,taken,,,\n'
+            'john@new.example.com,,,,\n'
+            'john@newer.example.com,,,,\n'
+            'not-an-email,,,,\n'
+        ), 'csv')
+
+        # Taken emails, taken usernames, john's next suffix, then the insert
+        # and the read-back of the new rows in a savepoint.
+        with self.assertNumQueries(7):
+            stats = provision_users(rows)
+
+        self.assertEqual((stats.rows, stats.created, stats.skipped, stats.invalid), (7, 3, 3, 1))
+        jane = CustomUser.objects.get(username='jane')
+        self.assertTrue(jane.check_password('secret123'))
+        self.assertEqual((jane.first_name, jane.gender, jane.is_active), ('Jane', 'female', False))
+        self.assertEqual(
+            sorted(CustomUser.objects.filter(email__startswith='john@new').values_list('username', flat=True)),
+            ['john1', 'john2'],
+        )
+        self.assertFalse(CustomUser.objects.get(username='john1').has_usable_password())
+
+    def test_jsonl_invites_in_batches(self):
+        lines = ''.join(
+            json.dumps({'email': f'user{i}@example.com', 'password': 'secret123'}) + '\n\n'
+            for i in range(5)
+        )
+        progress = []
+
+        stats = provision_users(
+            read_rows(io.StringIO(lines), 'jsonl'), batch_size=2, invite=True, active=True,
+            progress=lambda stats: progress.append(stats.created),
+        )
+
+        self.assertEqual((stats.created, stats.batches), (5, 3))
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertFalse(any(user.has_usable_password() for user in CustomUser.objects.all()))
+        self.assertTrue(all(CustomUser.objects.values_list('is_active', flat=True)))
+
+    def test_malformed_lines_are_counted_and_skipped(self):
+        lines = '{"email": "jane@example.com"}\n{"email": \n["not", "an", "object"]\n{"email": "john@example.com"}\n'
+
+        stats = provision_users(read_rows(io.StringIO(lines), 'jsonl'), batch_size=2)
+
+        self.assertEqual((stats.rows, stats.created, stats.invalid), (4, 2, 2))
+        self.assertEqual(CustomUser.objects.count(), 2)
+
+    def test_verification_emails_are_queued_for_created_users(self):
+        CustomUser.objects.create(email='old@example.com', username='old')
+        rows = [{'email': 'old@example.com'}, {'email': 'new@example.com', 'first_name': 'New'}]
+
+        stats = provision_users(rows, verification_base_url='https://app.example.com')
+
+        self.assertEqual(stats.emails_queued, 1)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['new@example.com'])
+        self.assertIn('https://app.example.com/', email.body)
+        self.assertEqual(EmailVerificationToken.objects.get().user.email, 'new@example.com')
+
+    def test_command_reports_progress(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            file.write('{"email": "jane@example.com"}\n{"email": "john@example.com"}\n')
+        self.addCleanup(os.remove, file.name)
+        out = io.StringIO()
+
+        call_command('provision_users', file.name, '--batch-size', '1', stdout=out)
+
+        self.assertEqual(CustomUser.objects.count(), 2)
+        self.assertIn('2 rows: 2 created', out.getvalue())
+        self.assertIn('Provisioned 2 of 2 user(s) in 2 batch(es)', out.getvalue())
+
+
+class BenchmarkBaselineTests(TestCase):
+    def test_find_regressions(self):
+        baseline = {
+            'b.login_requests_per_second': 100.0,
+            'b.login_p50_us': 1000.0,
+            'b.login_p99_us': 2000.0,
+            'b.login_queries_per_request': 2.0,
+            'b.login_failures': 0,
+            'b.rows': 1000,
+        }
+        results = {
+            'b.login_requests_per_second': 80.0,
+            'b.login_p50_us': 1200.0,
+            'b.login_p99_us': 9000.0,
+            'b.login_queries_per_request': 2.0,
+            'b.login_failures': 0,
+            'b.rows': 10,
+        }
+        self.assertEqual(find_regressions(baseline, results, 0.25), [])
+
+        results.update({
+            'b.login_requests_per_second': 70.0,
+            'b.login_p50_us': 1300.0,
+            'b.login_queries_per_request': 3.0,
+            'b.login_failures': 1,
+        })
+        self.assertEqual(
+            [line.split(':')[0] for line in find_regressions(baseline, results, 0.25)],
+            ['b.login_failures', 'b.login_p50_us', 'b.login_queries_per_request', 'b.login_requests_per_second'],
+        )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_throttle_store()
+        self.user = CustomUser.objects.create_user('jane@example.com', 'secret123', username='jane', is_active=True)
+
+    async def post(self, view, data):
+        request = AsyncRequestFactory().post('/', data, content_type='application/json')
+        response = await view.as_view()(request)
+        return response.render()
+
+    def test_views_are_coroutines(self):
+        for view in (async_views.RegisterView, async_views.LoginView, async_views.GoogleLoginView):
+            self.assertTrue(iscoroutinefunction(view.as_view()))
+
+    async def test_login(self):
+        response = await self.post(async_views.LoginView, {'email': 'JANE@example.com', 'password': 'secret123'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['data']['user']['username'], 'jane')
+        self.assertTrue(await OutstandingToken.objects.filter(user_id=self.user.pk).aexists())
+
+        response = await self.post(async_views.LoginView, {'email': 'jane@example.com', 'password': 'wrong'})
+        self.assertEqual(json.loads(response.content)['message'], 'Invalid credentials')
+
+    async def test_register_queues_verification_email(self):
+        response = await self.post(async_views.RegisterView, {
+            'email': 'john@example.com', 'username': 'john', 'password': 'secret123',
+            'first_name': 'John', 'last_name': 'Doe', 'gender': 'male',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        user = await CustomUser.objects.aget(email='john@example.com')
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('secret123'))
+        self.assertTrue(await OutboundEmail.objects.filter(to=['john@example.com']).aexists())
+
+    async def test_password_reset_confirm_revokes_tokens(self):
+        await PasswordResetToken.objects.acreate(user=self.user, token_hash=hash_token('reset-token'))
+
+        response = await self.post(async_views.PasswordResetConfirmView, {
+            'token': 'reset-token', 'new_password': 'n3w-Secret!',
+        })
+
+        self.assertEqual(json.loads(response.content)['message'], 'Password reset successful')
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.check_password('n3w-Secret!'))
+        self.assertEqual(user.token_version, self.user.token_version + 1)
+
+    @override_settings(AUTH_TOKEN_MODE='signed')
+    async def test_signed_reset_voids_other_outstanding_links(self):
+        first, second = (make_signed_token(self.user, PASSWORD_RESET) for _ in range(2))
+
+        response = await self.post(async_views.PasswordResetConfirmView, {'token': first, 'new_password': 'n3w-Secret!'})
+        self.assertEqual(json.loads(response.content)['message'], 'Password reset successful')
+
+        response = await self.post(async_views.PasswordResetConfirmView, {'token': second, 'new_password': 'other123'})
+        self.assertEqual(json.loads(response.content)['message'], 'Invalid token')
+
+    async def test_social_login_creates_then_reuses_user(self):
+        first = await self.post(async_views.GoogleLoginView, {'email': 'new@example.com'})
+        second = await self.post(async_views.GoogleLoginView, {'email': 'NEW@example.com'})
+
+        self.assertEqual(json.loads(first.content)['message'], 'Google account created and logged in.')
+        self.assertEqual(json.loads(second.content)['message'], 'Google login successful.')
+        self.assertEqual(await CustomUser.objects.filter(email='new@example.com').acount(), 1)
+
+    async def test_records_metrics(self):
+        registry.reset()
+        await self.async_client.post(
+            reverse('login'), {'email': 'jane@example.com', 'password': 'secret123'}, content_type='application/json',
+        )
+
+        self.assertIn('bill_buddy_password_hash_seconds_total{view="login",method="POST"}', registry.render())
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def load_settings(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'core', 'settings.py'))
+
+    def test_conn_max_age(self):
+        self.assertEqual(self.load_settings(DB_CONN_MAX_AGE='None')['DATABASES']['default']['CONN_MAX_AGE'], None)
+        self.assertEqual(self.load_settings(DB_CONN_MAX_AGE='0')['DATABASES']['default']['CONN_MAX_AGE'], 0)
+
+    def test_pool_requires_postgres(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'DB_POOL requires'):
+            self.load_settings(DB_POOL='True', DB_ENGINE='django.db.backends.sqlite3')
+
+    def test_pool_disables_persistent_connections(self):
+        database = self.load_settings(
+            DB_POOL='True', DB_ENGINE='django.db.backends.postgresql', DB_CONN_MAX_AGE='None', DB_POOL_MAX_SIZE='4',
+        )['DATABASES']['default']
+
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual((database['OPTIONS']['pool']['min_size'], database['OPTIONS']['pool']['max_size']), (2, 4))
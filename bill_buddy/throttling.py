@@ -0,0 +1,230 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 60)``: the request limit and window in seconds."""
+    count, period = rate.split('/')
+    return int(count), _PERIODS[period[0]]
+
+
+def _estimate(previous, current, elapsed):
+    # The current fixed window's count plus the share of the previous
+    # window's count that still overlaps the sliding window.
+    return previous * (1 - elapsed) + current
+
+
+def _wait(previous, current, elapsed, limit, window):
+    """Seconds until one more request fits under ``limit``."""
+    if limit < 1:
+        # A zero rate closes the endpoint; clients may check back in a window.
+        return float(window)
+    if current + 1 > limit:
+        # Only once this window has become the previous one.
+        return (1 - elapsed) * window + max(0.0, window * (1 - (limit - 1) / current))
+    return max(0.0, window * (1 - elapsed - (limit - current - 1) / previous))
+
+
+class LocalWindowCounter:
+    """
+    Sliding-window request counters for this process.
+
+    Each key holds three numbers: the index of its current fixed window and
+    the counts of that window and the one before, kept in an LRU bounded to
+    ``maxsize`` keys.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now=None):
+        """
+        Counts a request for ``key``, unless ``limit`` requests already fall
+        in the last ``window`` seconds. Returns 0, or the seconds to wait.
+        """
+        now = time.time() if now is None else now
+        index = int(now // window)
+        elapsed = now % window / window
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < index - 1:
+                previous = current = 0
+            elif entry[0] == index:
+                previous, current = entry[1], entry[2]
+            else:
+                previous, current = entry[2], 0
+
+            if _estimate(previous, current, elapsed) + 1 > limit:
+                return _wait(previous, current, elapsed, limit, window)
+
+            self._entries[key] = (index, previous, current + 1)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return 0
+
+    async def ahit(self, key, limit, window, now=None):
+        # In memory, so there is nothing to await.
+        return self.hit(key, limit, window, now)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheWindowCounter:
+    """
+    The same counters in a shared cache, so all processes count together:
+    one integer key per key and fixed window, expiring after two windows.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def hit(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        index = int(now // window)
+        elapsed = now % window / window
+        current_key = f'bill_buddy:throttle:{key}:{index}'
+        previous = self.cache.get(f'bill_buddy:throttle:{key}:{index - 1}', 0)
+
+        # Count first so concurrent requests can't all slip under the limit.
+        if self.cache.add(current_key, 1, timeout=2 * window):
+            current = 1
+        else:
+            try:
+                current = self.cache.incr(current_key)
+            except ValueError:  # Expired since the add.
+                self.cache.set(current_key, 1, timeout=2 * window)
+                current = 1
+
+        if _estimate(previous, current - 1, elapsed) + 1 > limit:
+            self.cache.decr(current_key)
+            return _wait(previous, current - 1, elapsed, limit, window)
+        return 0
+
+    async def ahit(self, key, limit, window, now=None):
+        """``hit`` through the cache's async API, for the async views."""
+        now = time.time() if now is None else now
+        index = int(now // window)
+        elapsed = now % window / window
+        current_key = f'bill_buddy:throttle:{key}:{index}'
+        previous = await self.cache.aget(f'bill_buddy:throttle:{key}:{index - 1}', 0)
+
+        if await self.cache.aadd(current_key, 1, timeout=2 * window):
+            current = 1
+        else:
+            try:
+                current = await self.cache.aincr(current_key)
+            except ValueError:
+                await self.cache.aset(current_key, 1, timeout=2 * window)
+                current = 1
+
+        if _estimate(previous, current - 1, elapsed) + 1 > limit:
+            await self.cache.adecr(current_key)
+            return _wait(previous, current - 1, elapsed, limit, window)
+        return 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """The ``AUTH_THROTTLE_CACHE`` counters if set, else this process's own."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                alias = getattr(settings, 'AUTH_THROTTLE_CACHE', None)
+                if alias:
+                    _store = CacheWindowCounter(alias)
+                else:
+                    _store = LocalWindowCounter(getattr(settings, 'AUTH_THROTTLE_LOCAL_SIZE', 100_000))
+    return _store
+
+
+def reset_throttle_store():
+    """Drops the process's counters, e.g. between tests."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Limits requests to the rate ``DEFAULT_THROTTLE_RATES`` sets for
+    ``<view.throttle_scope>_<kind>``, per identity as returned by
+    ``get_identity``. Views without a scope or rate aren't throttled.
+
+    Throttles run in ``APIView.initial()``, before the handler, so a
+    rejected request costs a counter lookup, not a password hash or email.
+    """
+    kind = None
+
+    def get_identity(self, request):
+        raise NotImplementedError
+
+    def _counter(self, request, view):
+        """``(key, limit, window)`` to count the request under, or None."""
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}') if scope else None
+        if rate is None:
+            return None
+        identity = self.get_identity(request)
+        if identity is None:
+            return None
+        return (f'{scope}_{self.kind}:{identity}', *parse_rate(rate))
+
+    def allow_request(self, request, view):
+        counter = self._counter(request, view)
+        if counter is None:
+            return True
+        self.wait_seconds = get_throttle_store().hit(*counter)
+        return not self.wait_seconds
+
+    async def aallow_request(self, request, view):
+        """``allow_request`` for the async views; a shared store is awaited."""
+        counter = self._counter(request, view)
+        if counter is None:
+            return True
+        self.wait_seconds = await get_throttle_store().ahit(*counter)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ClientIPRateThrottle(SlidingWindowThrottle):
+    """Per client IP (``REMOTE_ADDR``, or ``X-Forwarded-For`` with ``NUM_PROXIES``)."""
+    kind = 'ip'
+
+    def get_identity(self, request):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(SlidingWindowThrottle):
+    """Per email address in the request body, whichever IPs it comes from."""
+    kind = 'email'
+
+    def get_identity(self, request):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Hashed, so counters hold no addresses and cache keys stay short.
+        return hashlib.blake2b(email.strip().lower().encode(), digest_size=16).hexdigest()
+
+
+AUTH_THROTTLE_CLASSES = [ClientIPRateThrottle, EmailRateThrottle]
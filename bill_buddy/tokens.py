@@ -0,0 +1,86 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
+
+EMAIL_VERIFY = 'email-verify'
+PASSWORD_RESET = 'password-reset'
+
+# How long an emailed verification / password reset link works, in either
+# token mode; the emails and responses advertise 10 minutes.
+TOKEN_LIFETIME = timedelta(minutes=10)
+TOKEN_MAX_AGE = int(TOKEN_LIFETIME.total_seconds())
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class TokenExpired(InvalidToken):
+    pass
+
+
+class TokenAlreadyUsed(InvalidToken):
+    pass
+
+
+def uses_signed_tokens():
+    return getattr(settings, 'AUTH_TOKEN_MODE', 'model') == 'signed'
+
+
+def _signer(purpose):
+    return TimestampSigner(salt=f'bill_buddy.tokens.{purpose}')
+
+
+def make_signed_token(user, purpose):
+    """
+    Returns a stateless one-time token carrying
+    ``<user id>:<token version>:<nonce>``.
+
+    Nothing is written to the database; single use is enforced when the
+    token is consumed. The user's ``token_version`` ties the token to the
+    account state: a password change or deactivation voids it.
+    """
+    return _signer(purpose).sign(f'{user.pk}:{user.token_version}:{secrets.token_urlsafe(9)}')
+
+
+def read_signed_token(token, purpose, max_age=TOKEN_MAX_AGE):
+    """Returns the ``(user_id, token_version, nonce)`` carried by a valid token."""
+    try:
+        value = _signer(purpose).unsign(token or '', max_age=max_age)
+    except SignatureExpired:
+        raise TokenExpired
+    except BadSignature:
+        raise InvalidToken
+
+    user_id, version, nonce = (value.split(':', 2) + ['', ''])[:3]
+    if not user_id.isdigit() or not version.isdigit() or not nonce:
+        raise InvalidToken
+    return int(user_id), int(version), nonce
+
+
+def consume_nonce(purpose, nonce, max_age=TOKEN_MAX_AGE):
+    """
+    Marks ``nonce`` as used, raising ``TokenAlreadyUsed`` if it already was.
+
+    Used nonces are kept in the ``AUTH_TOKEN_NONCE_CACHE`` cache just past the
+    token lifetime and then evicted; ``cache.add`` makes the check-and-set
+    atomic. Deployments with several processes need a shared cache here.
+    """
+    if not _nonce_cache().add(_nonce_key(purpose, nonce), 1, timeout=max_age + 60):
+        raise TokenAlreadyUsed
+
+
+async def aconsume_nonce(purpose, nonce, max_age=TOKEN_MAX_AGE):
+    if not await _nonce_cache().aadd(_nonce_key(purpose, nonce), 1, timeout=max_age + 60):
+        raise TokenAlreadyUsed
+
+
+def _nonce_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_NONCE_CACHE', 'default')]
+
+
+def _nonce_key(purpose, nonce):
+    return f'bill_buddy:nonce:{purpose}:{nonce}'
@@ -1,17 +1,26 @@
-from django.urls import path
-from .views import (RegisterView, LoginView, EmailVerifyView, PasswordResetRequestView, PasswordResetConfirmView,
-ResendVerificationEmailView, ResendPasswordResetEmailView, LogoutView, GoogleLoginView)
+from django.conf import settings
+from django.urls import path, re_path
+from . import async_views, views
 
-urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
-    path('email-verify/', EmailVerifyView.as_view(), name='email-verify'),
-    path('password-reset/', PasswordResetRequestView.as_view(), name='password-reset'),
-    path('password-reset-confirm/', PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
-    path('resend-verification/', ResendVerificationEmailView.as_view(), name='resend-verification'),
-    path('resend-password-reset/', ResendPasswordResetEmailView.as_view(), name='resend-password-reset'),
-    path('logout/', LogoutView.as_view(), name='logout'),
-    path("social-login/", GoogleLoginView.as_view(), name="social-login"),
 
+def auth_urlpatterns(module):
+    """The public auth endpoints, served by the view classes in ``module``."""
+    return [
+        path('register/', module.RegisterView.as_view(), name='register'),
+        path('login/', module.LoginView.as_view(), name='login'),
+        path('email-verify/', module.EmailVerifyView.as_view(), name='email-verify'),
+        path('password-reset/', module.PasswordResetRequestView.as_view(), name='password-reset'),
+        path('password-reset-confirm/', module.PasswordResetConfirmView.as_view(), name='password-reset-confirm'),
+        path('resend-verification/', module.ResendVerificationEmailView.as_view(), name='resend-verification'),
+        path('resend-password-reset/', module.ResendPasswordResetEmailView.as_view(), name='resend-password-reset'),
+        path("social-login/", module.GoogleLoginView.as_view(), name="social-login"),
+    ]
 
-]
\ No newline at end of file
+
+urlpatterns = auth_urlpatterns(async_views if getattr(settings, 'AUTH_ASYNC_VIEWS', False) else views) + [
+    path('logout/', views.LogoutView.as_view(), name='logout'),
+    path('me/', views.MeView.as_view(), name='me'),
+    path('.well-known/jwks.json', views.JWKSView.as_view(), name='jwks'),
+    path('internal/metrics/', views.MetricsView.as_view(), name='metrics'),
+    re_path(r'^internal/users/export\.(?P<export_format>csv|ndjson)$', views.UserExportView.as_view(), name='user-export'),
+]
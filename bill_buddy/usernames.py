@@ -0,0 +1,86 @@
+import re
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Max
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+User = get_user_model()
+
+
+def username_base(email):
+    return slugify(email.split("@")[0]) or "user"
+
+
+def next_suffix(base):
+    """
+    Returns one more than the highest numeric suffix taken for ``base``.
+
+    A single query: a prefix scan over the username index (``LIKE 'base%'``)
+    narrowed to ``base`` followed by digits, and ``MAX`` of those digits.
+    """
+    suffix = Cast(Substr('username', len(base) + 1), BigIntegerField())
+    highest = (
+        User.objects
+        .filter(username__startswith=base, username__regex=rf'^{re.escape(base)}[0-9]{{1,18}}$')
+        .aggregate(highest=Max(suffix))['highest']
+    )
+    return (highest or 0) + 1
+
+
+def create_with_unique_username(base, attempts=5, **fields):
+    """
+    Creates a user named ``base``, or ``base<n>`` if that is taken.
+
+    The insert is attempted first and the unique index decides; only after a
+    username conflict is the next free suffix looked up, so concurrent
+    sign-ups retry instead of racing a pre-check.
+    """
+    username = base
+    for _ in range(attempts):
+        try:
+            with transaction.atomic():
+                return User.objects.create(username=username, **fields)
+        except IntegrityError:
+            if not User.objects.filter(username=username).exists():
+                # The conflict is on another unique column (e.g. the email).
+                raise
+        username = f'{base}{next_suffix(base)}'
+    raise IntegrityError(f"Could not allocate a unique username for {base!r}")
+
+
+def get_or_create_by_email(email, attempts=3, **defaults):
+    """
+    Returns ``(user, created)`` for ``email`` with a minimum of queries.
+
+    An existing user costs one indexed fetch. Otherwise the user is inserted
+    straight away with the unique email indexes as the conflict target: if a
+    concurrent request created the account first, the insert fails and the
+    next round fetches that account instead.
+    """
+    for _ in range(attempts):
+        user = User.objects.by_email(email).first()
+        if user is not None:
+            return user, False
+        try:
+            return create_with_unique_username(username_base(email), email=email, **defaults), True
+        except IntegrityError:
+            continue
+    raise IntegrityError(f"Could not get or create a user for {email!r}")
+
+
+async def aget_or_create_by_email(email, attempts=3, **defaults):
+    """``get_or_create_by_email`` for async views."""
+    for _ in range(attempts):
+        user = await User.objects.by_email(email).afirst()
+        if user is not None:
+            return user, False
+        try:
+            # The savepoint-and-retry insert runs as one sync call.
+            user = await sync_to_async(create_with_unique_username)(username_base(email), email=email, **defaults)
+            return user, True
+        except IntegrityError:
+            continue
+    raise IntegrityError(f"Could not get or create a user for {email!r}")
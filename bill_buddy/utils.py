@@ -1,68 +1,198 @@
-from django.core.mail import send_mail
-from django.urls import reverse
+from datetime import timedelta
+from itertools import islice
+from django.core.cache import caches
 from django.conf import settings
-from .models import PasswordResetToken, EmailVerificationToken
+from django.db import transaction
+from django.utils import timezone
+from .models import CustomUser, PasswordResetToken, EmailVerificationToken, hash_token
+from .outbox import aenqueue_email, enqueue_email, enqueue_emails
+from .emails import build_link, render_email, request_language, request_origin
+from .tokens import EMAIL_VERIFY, PASSWORD_RESET, make_signed_token, uses_signed_tokens
 from django.core.signing import TimestampSigner, SignatureExpired, BadSignature
 
-def send_verification_email(user, request):
+
+def _render_token_email(name, user, url_name, origin, token, language=None):
+    context = {
+        'first_name': user.first_name,
+        'url': build_link(origin, url_name, token),
+    }
+    return render_email(name, context, language)
+
+
+def _issue_token(model, user, purpose):
+    if uses_signed_tokens():
+        return make_signed_token(user, purpose)
+
     signer = TimestampSigner()
     token = signer.sign(user.email)
 
     # Invalidate previous tokens
-    EmailVerificationToken.objects.filter(user=user).delete()
+    model.objects.filter(user=user).delete()
 
     # Save new token
-    EmailVerificationToken.objects.create(user=user, token=token)
+    model.objects.create(user=user, token_hash=hash_token(token))
+    return token
 
-    verify_url = request.build_absolute_uri(
-        reverse('email-verify') + f'?token={token}'
+
+@transaction.atomic
+def send_verification_email(user, request):
+    token = _issue_token(EmailVerificationToken, user, EMAIL_VERIFY)
+
+    subject, message, html_message = _render_token_email(
+        'verification', user, 'email-verify',
+        request_origin(request), token, request_language(request),
     )
+    # Queued in the outbox; delivered by `manage.py send_queued_emails`
+    enqueue_email(subject, message, [user.email], settings.DEFAULT_FROM_EMAIL, html_message=html_message)
+
 
-    subject = 'Verify Your Email - Bill Buddy'
-    message = f"""
-    Hi {user.first_name},
+@transaction.atomic
+def send_password_reset_email(user, request):
+    token = _issue_token(PasswordResetToken, user, PASSWORD_RESET)
 
-    Please verify your email by clicking the link below:
+    subject, message, html_message = _render_token_email(
+        'password_reset', user, 'password-reset-confirm',
+        request_origin(request), token, request_language(request),
+    )
+    enqueue_email(subject, message, [user.email], settings.DEFAULT_FROM_EMAIL, html_message=html_message)
 
-    {verify_url}
 
-    If you did not register, please ignore this email.
+async def _aissue_token(model, user, purpose):
+    if uses_signed_tokens():
+        return make_signed_token(user, purpose)
 
-    Thanks,
-    Bill Buddy Team
-    """
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    token = TimestampSigner().sign(user.email)
+    await model.objects.filter(user=user).adelete()
+    await model.objects.acreate(user=user, token_hash=hash_token(token))
+    return token
 
 
+# Async variants for the async views. The async ORM can't join a
+# transaction, so the token and the outbox row are committed separately; a
+# token left without its email is harmless and replaced on the next request.
 
-def send_password_reset_email(user, request):
-    signer = TimestampSigner()
-    token = signer.sign(user.email)
+async def asend_verification_email(user, request):
+    token = await _aissue_token(EmailVerificationToken, user, EMAIL_VERIFY)
 
-    # Invalidate previous tokens
-    PasswordResetToken.objects.filter(user=user).delete()
+    subject, message, html_message = _render_token_email(
+        'verification', user, 'email-verify',
+        request_origin(request), token, request_language(request),
+    )
+    await aenqueue_email(subject, message, [user.email], settings.DEFAULT_FROM_EMAIL, html_message=html_message)
 
-    # Save new token
-    PasswordResetToken.objects.create(user=user, token=token)
 
-    reset_url = request.build_absolute_uri(
-        reverse('password-reset-confirm') + f'?token={token}'
+async def asend_password_reset_email(user, request):
+    token = await _aissue_token(PasswordResetToken, user, PASSWORD_RESET)
+
+    subject, message, html_message = _render_token_email(
+        'password_reset', user, 'password-reset-confirm',
+        request_origin(request), token, request_language(request),
     )
+    await aenqueue_email(subject, message, [user.email], settings.DEFAULT_FROM_EMAIL, html_message=html_message)
+
+
+def _sent_cache():
+    return caches[getattr(settings, 'EMAIL_RESEND_CACHE', 'default')]
+
+
+def _sent_key(user, purpose):
+    return f'bill_buddy:email_sent:{purpose}:{user.pk}'
+
+
+def send_once(send, user, request, purpose):
+    """
+    Calls ``send(user, request)`` unless a ``purpose`` email was sent to the
+    user in the last ``EMAIL_RESEND_WINDOW`` seconds; returns whether it did.
+
+    Repeated clicks within the window neither replace the token (the link
+    already sent stays valid) nor queue another email. Tokens are stored
+    hashed, so the earlier one can't be sent again; the request is dropped.
+    """
+    window = getattr(settings, 'EMAIL_RESEND_WINDOW', 60)
+    key = _sent_key(user, purpose)
+    if window and not _sent_cache().add(key, 1, timeout=window):
+        return False
+    try:
+        send(user, request)
+    except Exception:
+        _sent_cache().delete(key)
+        raise
+    return True
+
+
+async def asend_once(send, user, request, purpose):
+    """``send_once`` for the async views, with an async ``send``."""
+    window = getattr(settings, 'EMAIL_RESEND_WINDOW', 60)
+    key = _sent_key(user, purpose)
+    if window and not await _sent_cache().aadd(key, 1, timeout=window):
+        return False
+    try:
+        await send(user, request)
+    except Exception:
+        await _sent_cache().adelete(key)
+        raise
+    return True
+
+
+def issue_verification_tokens(users):
+    """
+    Verification tokens for ``users``, in order, replacing their previous
+    ones with one delete and one bulk insert (none in signed mode).
+    """
+    if uses_signed_tokens():
+        return [make_signed_token(user, EMAIL_VERIFY) for user in users]
 
-    subject = 'Reset Your Password - Bill Buddy'
-    message = f"""
-    Hi {user.first_name},
+    signer = TimestampSigner()
+    tokens = [signer.sign(user.email) for user in users]
+    with transaction.atomic():
+        EmailVerificationToken.objects.filter(user__in=users).delete()
+        EmailVerificationToken.objects.bulk_create([
+            EmailVerificationToken(user=user, token_hash=hash_token(token))
+            for user, token in zip(users, tokens)
+        ])
+    return tokens
 
-    You requested a password reset. Click the link below to reset your password:
 
-    {reset_url}
+def enqueue_verification_emails(users, base_url):
+    """
+    Queues verification emails for ``users`` in bulk, with links on
+    ``base_url``: one token insert and one outbox insert in all.
+    """
+    messages = []
+    for user, token in zip(users, issue_verification_tokens(users)):
+        subject, message, html_message = _render_token_email(
+            'verification', user, 'email-verify', base_url, token,
+        )
+        messages.append((subject, message, [user.email], html_message))
+    return len(enqueue_emails(messages))
 
-    If you didn't request this, please ignore this email.
 
-    Thanks,
-    Bill Buddy Team
+def resend_verification_emails(base_url, hours=24, chunk_size=200):
+    """
+    Re-sends verification emails to every inactive user who joined in the
+    last ``hours`` hours, through the outbox like every other email. Users
+    from before ``date_joined`` was recorded (null) are never included.
+
+    Users are streamed with ``.iterator()`` and handled ``chunk_size`` at a
+    time by ``enqueue_verification_emails``: per chunk, one transaction
+    replaces the tokens and inserts the emails, so a chunk's new links are
+    never left without their emails. Returns the number of emails queued.
     """
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    since = timezone.now() - timedelta(hours=hours)
+
+    users = (
+        CustomUser.objects
+        .filter(is_active=False, date_joined__gte=since)
+        .only('pk', 'email', 'first_name', 'token_version')
+        .order_by('pk')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    queued = 0
+    while chunk := list(islice(users, chunk_size)):
+        with transaction.atomic():
+            queued += enqueue_verification_emails(chunk, base_url)
+    return queued
 
 
 
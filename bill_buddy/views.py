@@ -2,222 +2,137 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate
-from .models import CustomUser,PasswordResetToken, EmailVerificationToken
-from .utils import send_verification_email, send_password_reset_email
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
-from rest_framework.permissions import IsAuthenticated
+from .models import CustomUser,PasswordResetToken, EmailVerificationToken, hash_token
+from .utils import send_once, send_verification_email, send_password_reset_email
+from .tokens import EMAIL_VERIFY, PASSWORD_RESET, InvalidToken, consume_nonce, read_signed_token, uses_signed_tokens
+from rest_framework_simplejwt.tokens import TokenError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from . import auth_flows as flows
+from .authentication import ClaimsRefreshToken
+from .exports import CONTENT_TYPES, FORMATS, aiterate, export_pages
+from .keyring import jwks_document
+from .metrics import registry
 from .response import custom_response
-from .serializers import RegisterSerializer, PasswordResetConfirmSerializer
-from django.core.signing import TimestampSigner, SignatureExpired, BadSignature
+from .profiles import cached_profile, profile_for, store_profile
+from .serializers import RegisterSerializer, PasswordResetConfirmSerializer, ProfileUpdateSerializer
+from .throttling import AUTH_THROTTLE_CLASSES
+from .usernames import get_or_create_by_email
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 User = get_user_model()
 
 class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if not serializer.is_valid():
-            return custom_response(
-                success=False,
-                message="Validation failed",
-                errors=serializer.errors,
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
-
-        user = serializer.save()
-        send_verification_email(user, request)
+            return flows.validation_failed(serializer.errors)
 
-        return custom_response(
-            success=True,
-            message="User registered successfully, Please check your email to verify your account the link will expire in 10 minutes.",
-            status_code=status.HTTP_201_CREATED
-        )
+        flows.register(serializer, request)
+        return flows.registered()
 
 
 class EmailVerifyView(APIView):
     def get(self, request):
         token = request.query_params.get('token')
-        signer = TimestampSigner()
+        if uses_signed_tokens():
+            return self.verify_signed_token(token)
 
         try:
-            verification_token = EmailVerificationToken.objects.get(token=token)
+            verification_token = EmailVerificationToken.objects.select_related('user').get(token_hash=hash_token(token))
         except EmailVerificationToken.DoesNotExist:
-            return custom_response(
-                success=False,
-                message="Invalid token.",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
-
-        if verification_token.used:
-            return custom_response(success=False, message="Token already used.")
-
-        if verification_token.is_expired():
-            return custom_response(success=False, message="Token expired.")
+            return flows.invalid_verification_token()
 
-        try:
-            email = signer.unsign(token, max_age=60 * 10)
-        except (SignatureExpired, BadSignature):
-            return custom_response(
-                success=False,
-                message="Invalid or expired token.",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+        error = flows.check_verification_token(verification_token, token)
+        if error is not None:
+            return error
 
         user = verification_token.user
-
-        if user.email != email:
-            return custom_response(success=False, message="Token does not match user.")
-
-        if user.is_active:
-            return custom_response(success=True, message="Account already activated.")
-
         user.is_active = True
         user.save()
 
         verification_token.used = True
         verification_token.save()
 
-        return custom_response(success=True, message="Email verified successfully. You can now log in.")
+        return flows.verified()
+
+    def verify_signed_token(self, token):
+        try:
+            user_id, _, nonce = read_signed_token(token, EMAIL_VERIFY)
+            consume_nonce(EMAIL_VERIFY, nonce)
+        except InvalidToken as exc:
+            return flows.signed_verification_error(exc)
+
+        # Activation is idempotent, so the update itself is the only write.
+        if CustomUser.objects.filter(pk=user_id, is_active=False).update(is_active=True):
+            return flows.verified()
+
+        if CustomUser.objects.filter(pk=user_id).exists():
+            return flows.already_activated()
+        return flows.invalid_verification_token()
 
 
 class LoginView(APIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'login'
+
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
-
-        if not email or not password:
-            return custom_response(
-                success=False,
-                message="Email and password required",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+        error = flows.missing_credentials(email, password)
+        if error is not None:
+            return error
 
         user = authenticate(request, email=email, password=password)
+        error = flows.login_refused(user)
+        if error is not None:
+            return error
 
-        if user is None:
-            return custom_response(
-                success=False,
-                message="Invalid credentials",
-                status_code=status.HTTP_401_UNAUTHORIZED
-            )
-
-        if not user.is_active:
-            return custom_response(
-                success=False,
-                message="Account not activated. Please verify your email.",
-                status_code=status.HTTP_401_UNAUTHORIZED
-            )
+        refresh = ClaimsRefreshToken.for_user(user)
+        return flows.logged_in(refresh, profile_for(user)[0])
 
-        refresh = RefreshToken.for_user(user)
-
-        return custom_response(
-            success=True,
-            message="Login successful",
-            data={
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": {
-                    "username": user.username,
-                    "email": user.email,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "gender": user.gender,
-                }
-            }
-        )
-
-def generate_safe_username(email):
-    base = slugify(email.split("@")[0]) or "user"
-    username = base
-    counter = 1
-    while User.objects.filter(username=username).exists():
-        username = f"{base}{counter}"
-        counter += 1
-    return username
 
 class GoogleLoginView(APIView):
     def post(self, request):
         email = request.data.get("email")
-
         if not email:
-            return custom_response(
-                success=False,
-                message="Email is required.",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return flows.email_required("Email is required.")
 
         try:
-            with transaction.atomic():
-                user_qs = User.objects.filter(email=email)
-                if user_qs.exists():
-                    user = user_qs.get()
-                    created = False
-                else:
-                    safe_username = generate_safe_username(email)
-                    user = User.objects.create(
-                        email=email,
-                        username=safe_username,
-                        first_name="",  # optionally derive from another field if available
-                        last_name="",
-                        is_active=True,  # auto-activate Google users
-                    )
-                    created = True
-        except IntegrityError:
-            return custom_response(
-                success=False,
-                message="Database error while creating or retrieving user.",
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+            user, created = get_or_create_by_email(
+                email,
+                first_name="",  # optionally derive from another field if available
+                last_name="",
+                is_active=True,  # auto-activate Google users
             )
+        except IntegrityError:
+            return flows.social_login_failed()
 
-        refresh = RefreshToken.for_user(user)
-
-        msg = (
-            "Google account created and logged in."
-            if created
-            else "Google login successful."
-        )
-
-        return custom_response(
-            success=True,
-            message=msg,
-            data={
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": {
-                    "username": user.username,
-                    "email": user.email,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "gender": user.gender,
-                },
-            },
-        )
+        refresh = ClaimsRefreshToken.for_user(user)
+        return flows.logged_in(refresh, profile_for(user)[0], flows.social_login_message(created))
 
 
 class PasswordResetRequestView(APIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         email = request.data.get('email')
         if not email:
-            return custom_response(
-                success=False,
-                message="Email is required",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return flows.email_required()
         try:
-            user = CustomUser.objects.get(email=email)
+            user = CustomUser.objects.by_email(email).get()
         except CustomUser.DoesNotExist:
-            return custom_response(
-                success=False,
-                message="User with this email does not exist",
-                status_code=status.HTTP_404_NOT_FOUND
-            )
+            return flows.user_not_found()
+
+        send_once(send_password_reset_email, user, request, PASSWORD_RESET)
+        return flows.reset_requested()
 
-        send_password_reset_email(user, request)
-        return custom_response(
-            success=True,
-            message="Password reset request sent. Please check your email the link will expire in 10 minutes."
-        )
 
 class PasswordResetConfirmView(APIView):
     def post(self, request):
@@ -227,16 +142,17 @@ class PasswordResetConfirmView(APIView):
         token = serializer.validated_data['token']
         new_password = serializer.validated_data['new_password']
 
+        if uses_signed_tokens():
+            return self.reset_with_signed_token(token, new_password)
+
         try:
-            reset_token = PasswordResetToken.objects.get(token=token)
+            reset_token = PasswordResetToken.objects.select_related('user').get(token_hash=hash_token(token))
         except PasswordResetToken.DoesNotExist:
-            return custom_response(success=False, message="Invalid token", status_code=400)
-
-        if reset_token.used:
-            return custom_response(success=False, message="Token already used", status_code=400)
+            return flows.invalid_reset_token()
 
-        if reset_token.is_expired():
-            return custom_response(success=False, message="Token expired", status_code=400)
+        error = flows.check_reset_token(reset_token)
+        if error is not None:
+            return error
 
         user = reset_token.user
         user.set_password(new_password)
@@ -245,67 +161,63 @@ class PasswordResetConfirmView(APIView):
         reset_token.used = True
         reset_token.save()
 
-        return custom_response(success=True, message="Password reset successful")
+        return flows.password_reset()
+
+    def reset_with_signed_token(self, token, new_password):
+        try:
+            user_id, version, nonce = read_signed_token(token, PASSWORD_RESET)
+            user = CustomUser.objects.get(pk=user_id)
+            flows.check_token_version(user, version)
+            consume_nonce(PASSWORD_RESET, nonce)
+        except CustomUser.DoesNotExist:
+            return flows.invalid_reset_token()
+        except InvalidToken as exc:
+            return flows.signed_reset_error(exc)
+
+        user.set_password(new_password)
+        user.save(update_fields=['password'])
+
+        return flows.password_reset()
+
 
 class ResendVerificationEmailView(APIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'resend_verification'
+
     def post(self, request):
         email = request.data.get('email')
-
         if not email:
-            return custom_response(
-                success=False,
-                message="Email is required",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return flows.email_required()
 
         try:
-            user = CustomUser.objects.get(email=email)
+            user = CustomUser.objects.by_email(email).get()
         except CustomUser.DoesNotExist:
-            return custom_response(
-                success=False,
-                message="User with this email does not exist",
-                status_code=status.HTTP_404_NOT_FOUND
-            )
+            return flows.user_not_found()
 
         if user.is_active:
-            return custom_response(
-                success=False,
-                message="Account is already verified.",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return flows.already_verified()
 
-        send_verification_email(user, request)
-        return custom_response(
-            success=True,
-            message="Verification email resent. Please check your inbox the link will expire in 10 minutes."
-        )
+        send_once(send_verification_email, user, request, EMAIL_VERIFY)
+        return flows.verification_resent()
 
 
 class ResendPasswordResetEmailView(APIView):
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'resend_password_reset'
+
     def post(self, request):
         email = request.data.get('email')
-
         if not email:
-            return custom_response(
-                success=False,
-                message="Email is required",
-                status_code=status.HTTP_400_BAD_REQUEST
-            )
+            return flows.email_required()
 
         try:
-            user = CustomUser.objects.get(email=email)
+            user = CustomUser.objects.by_email(email).get()
         except CustomUser.DoesNotExist:
-            return custom_response(
-                success=False,
-                message="User with this email does not exist",
-                status_code=status.HTTP_404_NOT_FOUND
-            )
+            return flows.user_not_found()
+
+        send_once(send_password_reset_email, user, request, PASSWORD_RESET)
+        return flows.reset_resent()
 
-        send_password_reset_email(user, request)
-        return custom_response(
-            success=True,
-            message="Password reset email resent. Please check your inbox the link will expire in 10 minutes."
-        )
 
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
@@ -320,7 +232,7 @@ class LogoutView(APIView):
             )
 
         try:
-            token = RefreshToken(refresh_token)
+            token = ClaimsRefreshToken(refresh_token)
             token.blacklist()
 
             return custom_response(
@@ -334,3 +246,140 @@ class LogoutView(APIView):
                 message="Invalid or expired refresh token.",
                 status_code=status.HTTP_400_BAD_REQUEST
             )
+
+
+def _etag_matches(header, etag, weak=False):
+    """
+    Whether ``etag`` matches an ``If-Match`` (strong comparison) or, with
+    ``weak``, an ``If-None-Match`` header, where ``W/"x"`` matches ``"x"``.
+    """
+    tags = parse_etags(header)
+    if weak:
+        tags = [tag.removeprefix('W/') for tag in tags]
+    return '*' in tags or etag in tags
+
+
+def _with_etag(response, etag):
+    response['ETag'] = etag
+    # Per user, and always revalidated: a 304 costs no database query.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class MeView(APIView):
+    """
+    The authenticated user's profile, from the per-user profile cache.
+
+    Responses carry a strong ETag: ``If-None-Match`` with the current one
+    gets a 304, and a ``PATCH`` with a stale ``If-Match`` is refused.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        profile = cached_profile(request.user.id)
+        if profile is None:
+            return custom_response(
+                success=False,
+                message="User not found.",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+        data, etag = profile
+        if _etag_matches(request.headers.get('If-None-Match', ''), etag, weak=True):
+            return _with_etag(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), etag)
+        return _with_etag(custom_response(success=True, message="Profile fetched.", data=data), etag)
+
+    def patch(self, request):
+        user = request.user.instance
+        if_match = request.headers.get('If-Match')
+        if if_match and not _etag_matches(if_match, profile_for(user)[1]):
+            return custom_response(
+                success=False,
+                message="The profile has changed since it was fetched.",
+                status_code=status.HTTP_412_PRECONDITION_FAILED
+            )
+
+        serializer = ProfileUpdateSerializer(user, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return custom_response(
+                success=False,
+                message="Validation failed",
+                errors=serializer.errors,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        serializer.save()
+
+        # Cached now; the invalidation on save only runs once it commits.
+        data, etag = store_profile(user)
+        return _with_etag(custom_response(success=True, message="Profile updated.", data=data), etag)
+
+
+class JWKSView(APIView):
+    """The public keys access tokens are signed with, for local verification."""
+    authentication_classes = []
+
+    def get(self, request):
+        body, etag = jwks_document()
+        if _etag_matches(request.headers.get('If-None-Match', ''), etag, weak=True):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'JWT_JWKS_MAX_AGE', 3600)}"
+        return response
+
+
+class MetricsView(APIView):
+    """Per-view request metrics in the Prometheus text format, for internal scrapers."""
+    authentication_classes = []
+
+    @staticmethod
+    def client_allowed(request):
+        """
+        Whether the client, as resolved by DRF's ``get_ident`` (which honours
+        ``NUM_PROXIES``), is in ``REQUEST_METRICS_ALLOWED_IPS``. A forwarded
+        request with ``NUM_PROXIES`` unset is refused: its ``REMOTE_ADDR`` is
+        the proxy's, typically 127.0.0.1.
+        """
+        if request.META.get('HTTP_X_FORWARDED_FOR') and not api_settings.NUM_PROXIES:
+            return False
+        return BaseThrottle().get_ident(request) in getattr(settings, 'REQUEST_METRICS_ALLOWED_IPS', ())
+
+    def get(self, request):
+        if not self.client_allowed(request):
+            return custom_response(
+                success=False,
+                message="Forbidden",
+                status_code=status.HTTP_403_FORBIDDEN
+            )
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class UserExportView(APIView):
+    """
+    Every user with their token state, streamed as CSV or NDJSON for staff
+    reporting. The format is part of the path; DRF reserves ``?format=``.
+    Staff status is checked against the database, not just the token.
+    """
+    permission_classes = [IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The export sets its own content type; only errors are rendered.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, export_format):
+        # The is_staff claim outlives a demotion until the token expires.
+        if not CustomUser.objects.filter(pk=request.user.id, is_staff=True, is_active=True).exists():
+            return custom_response(
+                success=False,
+                message="You do not have permission to perform this action.",
+                status_code=status.HTTP_403_FORBIDDEN
+            )
+        chunks = FORMATS[export_format](export_pages(getattr(settings, 'USER_EXPORT_CHUNK_SIZE', 2000)))
+        if isinstance(request._request, ASGIRequest):
+            # Under ASGI a plain iterator would be read whole before sending.
+            chunks = aiterate(chunks)
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="users.{export_format}"'
+        response['Cache-Control'] = 'no-store'
+        return response
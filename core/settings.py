@@ -1,7 +1,8 @@
 import os
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,15 +35,28 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bill_buddy.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'bill_buddy.middleware.BrowserMiddleware',
+]
+
+# The cookie-based stack the admin needs, run by BrowserMiddleware for every
+# path except STATELESS_PATH_PREFIXES: the JWT-authenticated JSON API under
+# api/ skips sessions, CSRF, messages and X-Frame-Options.
+BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+STATELESS_PATH_PREFIXES = ['/api/']
+
+# The admin's checks look for its middleware in MIDDLEWARE only; they are in
+# BROWSER_MIDDLEWARE instead.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
 
 ROOT_URLCONF = 'core.urls'
 
@@ -73,13 +87,77 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default=''),
         'HOST': config('DB_HOST', default=''),
         'PORT': config('DB_PORT', default=''),
+        # Keep each worker's connection open across requests for this many
+        # seconds ("None" for no limit, 0 to reconnect every request). Under
+        # ASGI connections don't outlive a request; use DB_POOL there.
+        'CONN_MAX_AGE': config(
+            'DB_CONN_MAX_AGE', default='60', cast=lambda value: None if value.lower() == 'none' else int(value),
+        ),
+        # Ping a reused connection before its first query in a request, so a
+        # connection dropped by the load balancer is replaced, not an error.
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'OPTIONS': {},
     }
 }
 
+# Postgres connection pooling (psycopg[pool] from requirements.txt, which
+# also needs libpq on the host, or psycopg[binary]): each process keeps
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections, and a request waits up to
+# DB_POOL_TIMEOUT seconds for one. Idle connections beyond the minimum close
+# after DB_POOL_MAX_IDLE seconds and all are recycled after
+# DB_POOL_MAX_LIFETIME. Pooled connections are returned after every request,
+# so DB_CONN_MAX_AGE doesn't apply.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+if DB_POOL:
+    if DATABASES['default']['ENGINE'] != 'django.db.backends.postgresql':
+        raise ImproperlyConfigured("DB_POOL requires DB_ENGINE=django.db.backends.postgresql.")
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=600, cast=float),
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=3600, cast=float),
+    }
+
 # Custom user model
 AUTH_USER_MODEL = 'bill_buddy.CustomUser'
 AUTHENTICATION_BACKENDS = ['bill_buddy.backends.EmailBackend']
 
+# Email verification / password reset tokens: 'model' stores each token in the
+# database, 'signed' uses stateless signed tokens whose used nonces are kept in
+# AUTH_TOKEN_NONCE_CACHE (must be a shared cache when running several processes).
+AUTH_TOKEN_MODE = config('AUTH_TOKEN_MODE', default='model')
+AUTH_TOKEN_NONCE_CACHE = config('AUTH_TOKEN_NONCE_CACHE', default='default')
+
+# JWTs carry the user's token_version; requests check it against this cache
+# (shared across processes in production) and fall back to the database.
+# A revoked token may keep working for up to the timeout in other processes.
+AUTH_TOKEN_VERSION_CACHE = config('AUTH_TOKEN_VERSION_CACHE', default='default')
+AUTH_TOKEN_VERSION_CACHE_TIMEOUT = config('AUTH_TOKEN_VERSION_CACHE_TIMEOUT', default=60, cast=int)
+
+# Serialized user profiles (GET /api/me/ and the login payloads), dropped
+# whenever the user is saved; share the cache across processes in production.
+PROFILE_CACHE = config('PROFILE_CACHE', default='default')
+PROFILE_CACHE_TIMEOUT = config('PROFILE_CACHE_TIMEOUT', default=300, cast=int)
+
+
+# Serve the public auth endpoints with the coroutine views in
+# bill_buddy.async_views; turn on when deploying under ASGI (core.asgi).
+AUTH_ASYNC_VIEWS = config('AUTH_ASYNC_VIEWS', default=False, cast=bool)
+
+# Per-view request metrics (wall time, DB queries, password-hash and email
+# time), served as Prometheus text at api/internal/metrics/ to the listed
+# client IPs (resolved through NUM_PROXIES; forwarded requests are refused
+# while it is 0). Totals are per process, so scrape each worker. With
+# REQUEST_METRICS_SERVER_TIMING each response also carries a Server-Timing
+# header; leave it off where clients shouldn't see backend timings.
+REQUEST_METRICS = config('REQUEST_METRICS', default=True, cast=bool)
+REQUEST_METRICS_SERVER_TIMING = config('REQUEST_METRICS_SERVER_TIMING', default=False, cast=bool)
+REQUEST_METRICS_ALLOWED_IPS = config('REQUEST_METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+
+# Users fetched per keyset page (and streamed per chunk) by the staff export.
+USER_EXPORT_CHUNK_SIZE = config('USER_EXPORT_CHUNK_SIZE', default=2000, cast=int)
 
 # JWT Authentication settings
 SIMPLE_JWT = {
@@ -90,23 +168,88 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "ALGORITHM": "HS256",
     "SIGNING_KEY": SECRET_KEY,
-    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "AUTH_TOKEN_CLASSES": ("bill_buddy.authentication.ClaimsAccessToken",),
+    "TOKEN_USER_CLASS": "bill_buddy.authentication.ClaimsUser",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.token_blacklist.serializers.BlacklistTokenSerializer",
 }
 
+# Asymmetric JWT signing: comma-separated PEM files of RSA or Ed25519 private
+# keys (needs the cryptography package). The first key signs, with RS256 or
+# EdDSA; all of them verify and are published at api/.well-known/jwks.json.
+# To rotate, append the new key and wait JWT_JWKS_MAX_AGE seconds so verifiers
+# have fetched it, then move it first; drop the old key once the tokens it
+# signed have expired. Without keys, tokens are signed with HS256/SECRET_KEY.
+JWT_PRIVATE_KEY_FILES = config('JWT_PRIVATE_KEY_FILES', default='')
+JWT_PRIVATE_KEYS = [Path(path.strip()).read_text() for path in JWT_PRIVATE_KEY_FILES.split(',') if path.strip()]
+JWT_JWKS_MAX_AGE = config('JWT_JWKS_MAX_AGE', default=3600, cast=int)
+
+# Refresh-token blacklist lookups: blacklisted jtis are kept in a per-process
+# LRU of JWT_BLACKLIST_LOCAL_SIZE entries. Naming a shared cache alias in
+# JWT_BLACKLIST_CACHE also enables a Bloom filter that answers most lookups
+# for tokens that aren't blacklisted without touching the database.
+JWT_BLACKLIST_LOCAL_SIZE = config('JWT_BLACKLIST_LOCAL_SIZE', default=10_000, cast=int)
+JWT_BLACKLIST_CACHE = config('JWT_BLACKLIST_CACHE', default='') or None
+JWT_BLACKLIST_BLOOM_CAPACITY = config('JWT_BLACKLIST_BLOOM_CAPACITY', default=100_000, cast=int)
+JWT_BLACKLIST_BLOOM_ERROR_RATE = config('JWT_BLACKLIST_BLOOM_ERROR_RATE', default=0.001, cast=float)
+JWT_BLACKLIST_BLOOM_REBUILD = config('JWT_BLACKLIST_BLOOM_REBUILD', default=3600, cast=int)
+
 # REST Framework config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'bill_buddy.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Same output as JSONRenderer; uses orjson when it is installed.
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'bill_buddy.renderers.FastJSONRenderer',
     ],
+    # Client IPs are read from X-Forwarded-For when this many proxies (the
+    # load balancer) sit in front of the app; with 0, from REMOTE_ADDR.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    # Sliding-window limits (bill_buddy.throttling) for the login, reset and
+    # resend endpoints, per client IP (<scope>_ip) and email (<scope>_email).
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'login_email': config('THROTTLE_LOGIN_EMAIL', default='10/min'),
+        'password_reset_ip': config('THROTTLE_EMAIL_IP', default='10/min'),
+        'password_reset_email': config('THROTTLE_EMAIL_EMAIL', default='5/hour'),
+        'resend_verification_ip': config('THROTTLE_EMAIL_IP', default='10/min'),
+        'resend_verification_email': config('THROTTLE_EMAIL_EMAIL', default='5/hour'),
+        'resend_password_reset_ip': config('THROTTLE_EMAIL_IP', default='10/min'),
+        'resend_password_reset_email': config('THROTTLE_EMAIL_EMAIL', default='5/hour'),
+    },
 }
 
+# Throttle counters live in each process, in an LRU of at most
+# AUTH_THROTTLE_LOCAL_SIZE keys. Name a shared cache (e.g. Redis) in
+# AUTH_THROTTLE_CACHE so every worker counts against the same limits.
+AUTH_THROTTLE_CACHE = config('AUTH_THROTTLE_CACHE', default='') or None
+AUTH_THROTTLE_LOCAL_SIZE = config('AUTH_THROTTLE_LOCAL_SIZE', default=100_000, cast=int)
+
+# Password hashing: PASSWORD_HASHER picks the tier used for new hashes
+# (pbkdf2, scrypt or argon2 - the latter needs argon2-cffi). The other tiers
+# still verify, and are upgraded to the preferred one on the next login.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_HASHER_TIERS = {
+    'pbkdf2': 'bill_buddy.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'bill_buddy.hashers.ScryptPasswordHasher',
+    'argon2': 'bill_buddy.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_TIERS[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_TIERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2**14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int)
+# Verify/rehash passwords in a process pool of this size (0 = in the request thread)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -137,6 +280,20 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_USE_SSL = config('EMAIL_USE_SSL', cast=bool)
 
+# Outbound email queue, drained by `manage.py send_queued_emails`
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=30, cast=int)  # seconds, doubled per attempt
+EMAIL_CONNECTION_IDLE_TIMEOUT = config('EMAIL_CONNECTION_IDLE_TIMEOUT', default=30, cast=int)  # seconds before a pooled connection is reopened
+
+# Repeated password-reset / resend requests for the same user and email type
+# within this many seconds are dropped (0 sends every time): the link already
+# sent stays valid. It must be shorter than the token lifetime
+# (bill_buddy.tokens.TOKEN_LIFETIME, 10 minutes), which a system check enforces.
+# Tracked in EMAIL_RESEND_CACHE, which must be shared across processes.
+EMAIL_RESEND_WINDOW = config('EMAIL_RESEND_WINDOW', default=60, cast=int)
+EMAIL_RESEND_CACHE = config('EMAIL_RESEND_CACHE', default='default')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 